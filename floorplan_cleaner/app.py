@@ -1,24 +1,121 @@
 import os
+from collections import OrderedDict
+
 import numpy as np
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, Signal
 from PySide6.QtWidgets import (
-    QMainWindow, QFileDialog, QDockWidget, QVBoxLayout, QHBoxLayout,
+    QApplication, QMainWindow, QFileDialog, QDockWidget, QVBoxLayout, QHBoxLayout,
     QWidget, QLabel, QComboBox, QPushButton, QListWidget, QListWidgetItem,
     QMessageBox, QStatusBar, QToolBar, QLineEdit,
 )
 from PySide6.QtGui import QAction
 
-from .canvas import FloorPlanCanvas, SELECTED_ROOM_COLOR, LABELED_ROOM_COLOR
+from .canvas import FloorPlanCanvas, SELECTED_ROOM_COLOR, LABELED_ROOM_COLOR, render_svg_image
 from .svg_parser import SvgParser
 from .flood_fill import FloodFiller
 from .export import Exporter
 from .preprocess import center_svg
-from .models import Room, ApartmentUnit
+from .models import Room, ApartmentUnit, PackedMask
 
 
 ROOM_TYPES = ["bedroom", "livingroom/diningroom", "all", "bathroom", "balcony"]
 TARGET_LONGEST_SIDE = 2000
 
+# Number of parsed plans (parser + boundary raster) kept for reopening the same file
+PARSED_PLAN_CACHE_SIZE = 2
+
+# Room list item role holding the "(label)" suffix, so renumbering needs no room lookup
+ROOM_LABEL_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class _LoadSignals(QObject):
+    rendered = Signal(object)  # base QImage, or None when the canvas has it cached
+    finished = Signal(object)  # (source_path, processed_path, parser, filler)
+    failed = Signal(str)
+
+
+class _RenderTask(QRunnable):
+    """Render the base display image of a preprocessed SVG on the thread pool."""
+
+    def __init__(self, svg_path: str, signals: _LoadSignals):
+        super().__init__()
+        self.svg_path = svg_path
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = render_svg_image(self.svg_path, TARGET_LONGEST_SIDE)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.rendered.emit(image)
+
+
+class _LoadTask(QRunnable):
+    """Preprocess, parse and rasterize an SVG off the GUI thread.
+
+    Only touches QImage/QSvgRenderer, which are safe outside the GUI thread;
+    the scene and widgets are updated by the receiver of `finished`.
+    """
+
+    # (abspath, mtime) of the preprocessed SVG -> (parser, filler), LRU order.
+    # The parser's elements and the filler's boundary raster are not changed
+    # after loading. The filler does fill its pixel_paths/stroke_stamp caches
+    # lazily, but those are keyed by the identity of the elements of the parser
+    # cached with it, so the pair is only safe to share together.
+    _parsed_cache: OrderedDict[tuple, tuple[SvgParser, FloodFiller]] = OrderedDict()
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.signals = _LoadSignals()
+
+    def run(self):
+        try:
+            # Preprocess: center SVG content by cropping viewBox to content bounds
+            processed_path = center_svg(self.path)
+
+            # The display image doesn't depend on parsing, so render it
+            # concurrently on another pool thread
+            if FloorPlanCanvas.has_cached_svg(processed_path, TARGET_LONGEST_SIDE):
+                self.signals.rendered.emit(None)
+            else:
+                QThreadPool.globalInstance().start(_RenderTask(processed_path, self.signals))
+
+            cache = _LoadTask._parsed_cache
+            key = (os.path.abspath(processed_path), os.path.getmtime(processed_path))
+            if key in cache:
+                cache.move_to_end(key)
+                parser, filler = cache[key]
+            else:
+                parser, filler = self._parse(processed_path)
+                cache[key] = (parser, filler)
+                if len(cache) > PARSED_PLAN_CACHE_SIZE:
+                    cache.popitem(last=False)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit((self.path, processed_path, parser, filler))
+
+    @staticmethod
+    def _parse(processed_path: str) -> tuple[SvgParser, FloodFiller]:
+        """Parse a preprocessed SVG and build its flood-fill boundary raster."""
+        # Parse SVG
+        parser = SvgParser(processed_path)
+        parser.parse()
+        vb = parser.viewbox
+
+        # Build flood filler at the display scale
+        scale = TARGET_LONGEST_SIDE / max(vb[2], vb[3])
+        filler = FloodFiller(vb, scale)
+        filler.build_boundary_raster(
+            svg_path=processed_path,
+            wall_elements=parser.get_walls(),
+            door_elements=parser.get_doors(),
+            window_elements=parser.get_windows(),
+        )
+        return parser, filler
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -31,11 +128,28 @@ class MainWindow(QMainWindow):
         self._input_name: str | None = None
         self._parser: SvgParser | None = None
         self._filler: FloodFiller | None = None
-        self._rooms: list[Room] = []
+        self._rooms_by_id: dict[int, Room] = {}  # all rooms, in creation order
+        self._unsaved_rooms: dict[int, Room] = {}  # rooms of the unit being built
+        # Per-pixel id of the unsaved room covering it (-1 if none)
+        self._room_id_map: np.ndarray | None = None
         self._units: list[ApartmentUnit] = []
         self._unit_counter = 1
         self._room_counter = 0
         self._scale: float = 1.0
+        self._load_task: _LoadTask | None = None
+        # Parse and render results of the running load; it completes once both arrive
+        self._load_result: tuple | None = None
+        self._load_image = None
+        self._load_rendered = False
+
+        # Room list selection changes are applied to the overlays after a short
+        # delay, so arrowing through the list recolors each room once at most
+        self._selection_timer = QTimer(self)
+        self._selection_timer.setSingleShot(True)
+        self._selection_timer.setInterval(30)
+        self._selection_timer.timeout.connect(self._apply_room_selection_change)
+        self._pending_selected: int | None = None
+        self._pending_deselected: set[int] = set()
 
         # Canvas
         self._canvas = FloorPlanCanvas()
@@ -57,13 +171,13 @@ class MainWindow(QMainWindow):
         toolbar.setMovable(False)
         self.addToolBar(toolbar)
 
-        open_action = QAction("Open SVG", self)
-        open_action.triggered.connect(self._open_svg)
-        toolbar.addAction(open_action)
+        self._open_action = QAction("Open SVG", self)
+        self._open_action.triggered.connect(self._open_svg)
+        toolbar.addAction(self._open_action)
 
-        reset_action = QAction("Reset", self)
-        reset_action.triggered.connect(self._reset)
-        toolbar.addAction(reset_action)
+        self._reset_action = QAction("Reset", self)
+        self._reset_action.triggered.connect(self._reset)
+        toolbar.addAction(self._reset_action)
 
     def _setup_sidebar(self):
         dock = QDockWidget("Room Panel", self)
@@ -144,31 +258,71 @@ class MainWindow(QMainWindow):
         self._input_name = os.path.splitext(os.path.basename(path))[0]
         self.statusBar().showMessage(f"Loading {os.path.basename(path)}...")
 
-        # Preprocess: center SVG content by cropping viewBox to content bounds
-        processed_path = center_svg(path)
-        self._svg_path = processed_path
+        # Heavy preprocessing runs on the thread pool; block re-entry until done
+        self._set_loading(True)
+        self._load_task = _LoadTask(path)
+        self._load_result = None
+        self._load_image = None
+        self._load_rendered = False
+        self._load_task.signals.rendered.connect(self._on_svg_rendered)
+        self._load_task.signals.finished.connect(self._on_svg_loaded)
+        self._load_task.signals.failed.connect(self._on_svg_load_failed)
+        QThreadPool.globalInstance().start(self._load_task)
+
+    def _set_loading(self, loading: bool):
+        self._open_action.setEnabled(not loading)
+        self._reset_action.setEnabled(not loading)
+        if loading:
+            QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        else:
+            QApplication.restoreOverrideCursor()
+
+    def _on_svg_load_failed(self, message: str):
+        # Parsing and rendering share these signals and either can fail; only
+        # the first failure is reported, and the other task's outcome must not
+        # leak into the next load
+        if self._load_task is None:
+            return
+        signals = self._load_task.signals
+        signals.rendered.disconnect(self._on_svg_rendered)
+        signals.finished.disconnect(self._on_svg_loaded)
+        signals.failed.disconnect(self._on_svg_load_failed)
+        self._load_task = None
+        self._set_loading(False)
+        self.statusBar().showMessage("Failed to load SVG.")
+        QMessageBox.warning(self, "Load Failed", message)
+
+    def _on_svg_rendered(self, image):
+        self._load_image = image
+        self._load_rendered = True
+        self._finish_svg_load()
+
+    def _on_svg_loaded(self, result: tuple):
+        self._load_result = result
+        self._finish_svg_load()
+
+    def _finish_svg_load(self):
+        """Show the loaded plan once both parsing and rendering have finished."""
+        if self._load_result is None or not self._load_rendered:
+            return
+        path, processed_path, parser, filler = self._load_result
+        image = self._load_image
+        self._load_task = None
+        self._load_result = None
+        self._load_image = None
+        self._load_rendered = False
+        self._set_loading(False)
 
-        # Parse SVG
-        self._parser = SvgParser(processed_path)
-        self._parser.parse()
-        vb = self._parser.viewbox
-
-        # Compute scale
-        self._scale = TARGET_LONGEST_SIDE / max(vb[2], vb[3])
-
-        # Build flood filler
-        self._filler = FloodFiller(vb, self._scale)
-        wall_types = {"IfcWall", "IfcWallStandardCase"}
-        wall_elements = [e for e in self._parser.elements if e.ifc_type in wall_types]
-        self._filler.build_boundary_raster(
-            svg_path=processed_path,
-            wall_elements=wall_elements,
-            door_elements=self._parser.get_doors(),
-            window_elements=self._parser.get_windows(),
+        self._svg_path = processed_path
+        self._parser = parser
+        self._filler = filler
+        self._scale = filler.scale
+        self._room_id_map = np.full(
+            (self._filler.raster_h, self._filler.raster_w), -1, dtype=np.int32
         )
 
-        # Display SVG
-        self._canvas.load_svg(processed_path, TARGET_LONGEST_SIDE)
+        # Display SVG (scene access must stay on the GUI thread)
+        self._canvas.load_svg(processed_path, TARGET_LONGEST_SIDE, image)
 
         n_walls = len(self._parser.get_elements_by_type("IfcWall")) + len(self._parser.get_elements_by_type("IfcWallStandardCase"))
         n_doors = len(self._parser.get_doors())
@@ -183,52 +337,62 @@ class MainWindow(QMainWindow):
         self._input_name = None
         self._parser = None
         self._filler = None
-        self._rooms.clear()
+        self._room_id_map = None
+        self._rooms_by_id.clear()
+        self._unsaved_rooms.clear()
         self._units.clear()
         self._unit_counter = 1
         self._room_counter = 0
         self._room_list.clear()
         self._unit_list.clear()
-        self._canvas._scene.clear()
-        self._canvas._overlay_items.clear()
-        self._canvas._base_pixmap_item = None
+        self._selection_timer.stop()
+        self._pending_selected = None
+        self._pending_deselected.clear()
+        self._canvas.clear()
         self.statusBar().showMessage("Open an SVG file to begin.")
 
     def _on_room_clicked(self, px: int, py: int):
         if self._filler is None:
             return
 
-        # Check if we already have a room at this pixel
-        for room in self._rooms:
-            if room.unit_id is None and room.flood_mask[py, px]:
-                self.statusBar().showMessage("Already selected this room. Click elsewhere or delete it.")
-                return
+        # The canvas raster can be a pixel wider/taller than the filler's, so
+        # leave out-of-range clicks to fill_at's bounds check
+        in_raster = 0 <= px < self._filler.raster_w and 0 <= py < self._filler.raster_h
+
+        # Check if we already have an unsaved room at this pixel
+        if in_raster and self._room_id_map[py, px] != -1:
+            self.statusBar().showMessage("Already selected this room. Click elsewhere or delete it.")
+            return
 
-        mask = self._filler.fill_at(px, py)
-        if mask is None:
+        fill = self._filler.fill_at(px, py)
+        if fill is None:
             self.statusBar().showMessage("No room detected at click point (boundary or too small/large).")
             return
+        mask, bbox_px = fill
 
         # Create room
         room_id = self._room_counter
         self._room_counter += 1
 
-        # Compute SVG bbox
-        ys, xs = mask.nonzero()
-        svg_x, svg_y = self._filler.pixel_to_svg(int(xs.min()), int(ys.min()))
-        svg_x2, svg_y2 = self._filler.pixel_to_svg(int(xs.max()), int(ys.max()))
+        # The fill already reports its pixel bounds, so the mask isn't rescanned
+        x0, y0, x1, y1 = bbox_px
+        svg_x, svg_y = self._filler.pixel_to_svg(x0, y0)
+        svg_x2, svg_y2 = self._filler.pixel_to_svg(x1 - 1, y1 - 1)
         bbox_svg = (svg_x, svg_y, svg_x2 - svg_x, svg_y2 - svg_y)
 
-        room = Room(id=room_id, label="", flood_mask=mask, bbox_svg=bbox_svg)
-        self._rooms.append(room)
+        room = Room(id=room_id, label="", flood_mask=PackedMask(mask, bbox_px), bbox_svg=bbox_svg)
+        self._rooms_by_id[room_id] = room
+        self._unsaved_rooms[room_id] = room
+        self._room_id_map[mask] = room_id
 
         # Add overlay
-        self._canvas.add_room_overlay(room_id, mask)
+        self._canvas.add_room_overlay(room_id, room.flood_mask)
 
         # Add to room list (display number is 1-based list position)
         display_num = self._room_list.count() + 1
         item = QListWidgetItem(f"Room {display_num} (unlabeled)")
         item.setData(Qt.ItemDataRole.UserRole, room_id)
+        item.setData(ROOM_LABEL_ROLE, "(unlabeled)")
         self._room_list.addItem(item)
         self._room_list.setCurrentItem(item)
 
@@ -236,14 +400,23 @@ class MainWindow(QMainWindow):
 
     def _on_room_selection_changed(self, current: QListWidgetItem | None, previous: QListWidgetItem | None):
         if previous is not None:
-            prev_id = previous.data(Qt.ItemDataRole.UserRole)
+            self._pending_deselected.add(previous.data(Qt.ItemDataRole.UserRole))
+        self._pending_selected = current.data(Qt.ItemDataRole.UserRole) if current is not None else None
+        self._selection_timer.start()
+
+    def _apply_room_selection_change(self):
+        cur_id = self._pending_selected
+        deselected = self._pending_deselected - {cur_id}
+        self._pending_selected = None
+        self._pending_deselected = set()
+
+        for prev_id in deselected:
             prev_room = self._find_room(prev_id)
             if prev_room is not None and prev_room.unit_id is None:
                 color = LABELED_ROOM_COLOR if prev_room.label else SELECTED_ROOM_COLOR
                 self._canvas.add_room_overlay(prev_id, prev_room.flood_mask, color=color)
 
-        if current is not None:
-            cur_id = current.data(Qt.ItemDataRole.UserRole)
+        if cur_id is not None:
             cur_room = self._find_room(cur_id)
             if cur_room is not None and cur_room.unit_id is None:
                 self._canvas.add_room_overlay(cur_id, cur_room.flood_mask, color=SELECTED_ROOM_COLOR)
@@ -263,6 +436,7 @@ class MainWindow(QMainWindow):
         room.label = label
         display_num = self._room_list.row(current_item) + 1
         current_item.setText(f"Room {display_num} ({label})")
+        current_item.setData(ROOM_LABEL_ROLE, f"({label})")
         self.statusBar().showMessage(f"Room {display_num} labeled as '{label}'.")
 
     def _delete_room(self):
@@ -272,7 +446,13 @@ class MainWindow(QMainWindow):
 
         room_id = current_item.data(Qt.ItemDataRole.UserRole)
         self._canvas.remove_room_overlay(room_id)
-        self._rooms = [r for r in self._rooms if r.id != room_id]
+        room = self._rooms_by_id.pop(room_id, None)
+        if room is not None:
+            del self._unsaved_rooms[room_id]
+            # Only the room's bbox can hold its id
+            x0, y0, x1, y1 = room.flood_mask.bbox
+            id_map = self._room_id_map[y0:y1, x0:x1]
+            id_map[id_map == room_id] = -1
         self._room_list.takeItem(self._room_list.row(current_item))
 
         # Renumber remaining items
@@ -280,7 +460,7 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage("Room deleted.")
 
     def _save_unit(self):
-        current_rooms = [r for r in self._rooms if r.unit_id is None]
+        current_rooms = list(self._unsaved_rooms.values())
         if not current_rooms:
             self.statusBar().showMessage("No rooms to save. Select rooms first.")
             return
@@ -289,17 +469,29 @@ class MainWindow(QMainWindow):
         unit = ApartmentUnit(id=unit_id, room_ids=[r.id for r in current_rooms])
         self._units.append(unit)
 
-        # Assign unit_id to rooms and update overlays
+        # Assign unit_id to rooms and recolor their overlays in one batch
         for room in current_rooms:
             room.unit_id = unit_id
-            self._canvas.update_room_overlay_color(room.id, room.flood_mask, unit_id)
+        self._canvas.update_room_overlays_color(
+            [(room.id, room.flood_mask, unit_id) for room in current_rooms]
+        )
 
         # Update unit list
         room_labels = ", ".join(r.label or "unlabelled" for r in current_rooms)
         self._unit_list.addItem(f"Unit {unit_id}: {len(current_rooms)} rooms ({room_labels})")
 
-        # Clear room list (they're now saved)
-        self._room_list.clear()
+        # Clear room list and id map (they're now saved). The rooms already
+        # carry their unit colors, so the selection-change handler has nothing
+        # to do for them and its signals are skipped.
+        self._room_list.setUpdatesEnabled(False)
+        self._room_list.blockSignals(True)
+        try:
+            self._room_list.clear()
+        finally:
+            self._room_list.blockSignals(False)
+            self._room_list.setUpdatesEnabled(True)
+        self._room_id_map.fill(-1)
+        self._unsaved_rooms.clear()
 
         self._unit_counter += 1
         self.statusBar().showMessage(f"Unit {unit_id} saved with {len(current_rooms)} rooms.")
@@ -326,7 +518,7 @@ class MainWindow(QMainWindow):
         exporter.export_all(
             svg_path=self._svg_path,
             input_name=self._input_name,
-            rooms=self._rooms,
+            rooms=list(self._rooms_by_id.values()),
             units=self._units,
             filler=self._filler,
             height_m=height_m,
@@ -339,22 +531,23 @@ class MainWindow(QMainWindow):
     def _refresh_unit_list_display(self):
         self._unit_list.clear()
         for unit in self._units:
-            unit_rooms = [r for r in self._rooms if r.unit_id == unit.id]
+            unit_rooms = [self._rooms_by_id[rid] for rid in unit.room_ids]
             room_labels = ", ".join(r.label or "unlabelled" for r in unit_rooms)
             self._unit_list.addItem(
                 f"Unit {unit.id}: {len(unit_rooms)} rooms ({room_labels})"
             )
 
     def _renumber_room_list(self):
-        for i in range(self._room_list.count()):
-            item = self._room_list.item(i)
-            room_id = item.data(Qt.ItemDataRole.UserRole)
-            room = self._find_room(room_id)
-            label_str = f"({room.label})" if room and room.label else "(unlabeled)"
-            item.setText(f"Room {i + 1} {label_str}")
+        # One repaint and no per-item change signals for the whole relabel
+        self._room_list.setUpdatesEnabled(False)
+        self._room_list.blockSignals(True)
+        try:
+            for i in range(self._room_list.count()):
+                item = self._room_list.item(i)
+                item.setText(f"Room {i + 1} {item.data(ROOM_LABEL_ROLE)}")
+        finally:
+            self._room_list.blockSignals(False)
+            self._room_list.setUpdatesEnabled(True)
 
     def _find_room(self, room_id: int) -> Room | None:
-        for r in self._rooms:
-            if r.id == room_id:
-                return r
-        return None
+        return self._rooms_by_id.get(room_id)
@@ -1,5 +1,11 @@
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
-from PySide6.QtCore import Qt, Signal, QRectF, QPointF, QLineF
+from PySide6.QtCore import (
+    Qt, Signal, QRectF, QPointF, QLineF, QObject, QRunnable, QThreadPool, QTimer,
+)
 from PySide6.QtGui import (
     QImage, QPixmap, QColor, QPainter, QWheelEvent, QMouseEvent, QPen,
 )
@@ -9,7 +15,8 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtSvg import QSvgRenderer
 
-from .room_splitter import snap_to_contour
+from .models import PackedMask, mask_bbox
+from .room_splitter import ContourSnapper
 
 
 # Colors for room overlays, cycled per unit
@@ -22,6 +29,10 @@ UNIT_COLORS = [
     QColor(50, 200, 200, 80),    # cyan
 ]
 
+# Color table for the saved-room layer: index 0 is transparent, index i + 1
+# is UNIT_COLORS[i]
+_UNIT_COLOR_TABLE = [0] + [c.rgba() for c in UNIT_COLORS]
+
 # Colors for unsaved rooms (current unit being built)
 SELECTED_ROOM_COLOR = QColor(255, 255, 0, 120)   # yellow - currently selected in list
 LABELED_ROOM_COLOR = QColor(100, 255, 100, 100)   # green - labeled but not yet saved
@@ -30,11 +41,100 @@ LABELED_ROOM_COLOR = QColor(100, 255, 100, 100)   # green - labeled but not yet
 SPLIT_HALF_A_COLOR = QColor(0, 200, 200, 100)    # cyan
 SPLIT_HALF_B_COLOR = QColor(200, 0, 200, 100)     # magenta
 
+# Number of rasterized base SVGs kept for reopening the same file
+SVG_PIXMAP_CACHE_SIZE = 4
+
+
+def _render_overlay_image(mask: np.ndarray, color: QColor) -> tuple[QImage, np.ndarray]:
+    """Tint a boolean mask into an ARGB32 QImage.
+
+    Returns (image, buf). The image aliases buf instead of copying it, and so
+    does a QPixmap converted from it, so buf must be kept alive for as long as
+    either is in use.
+    """
+    h, w = mask.shape
+
+    # Premultiplied ARGB32 pixels are native-endian 0xAARRGGBB words, so a
+    # single uint32 store per masked pixel writes all four channels. The color
+    # is constant, so premultiplying it here is free and lets Qt composite the
+    # overlay without its unpremultiplied blend path.
+    buf = np.empty((h, w), dtype=np.uint32)
+    a = color.alpha()
+    r = color.red() * a // 255
+    g = color.green() * a // 255
+    b = color.blue() * a // 255
+    # mask * pixel writes every output word in one pass (0 where unset), with
+    # no clearing pass and no boolean-index temporaries
+    np.multiply(mask, np.uint32((a << 24) | (r << 16) | (g << 8) | b), out=buf)
+
+    return QImage(buf.data, w, h, w * 4, QImage.Format.Format_ARGB32_Premultiplied), buf
+
+
+def _bbox_union(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    """Smallest (x0, y0, x1, y1) box containing both boxes."""
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def render_svg_image(svg_path: str, target_longest_side: int = 2000) -> QImage:
+    """Rasterize an SVG so its longest side is `target_longest_side` pixels.
+
+    Only uses QSvgRenderer and QImage, so it is safe to call off the GUI thread.
+    """
+    renderer = QSvgRenderer(svg_path)
+    vb = renderer.viewBox()
+    vb_w, vb_h = vb.width(), vb.height()
+
+    # Compute scale to make longest side = target
+    scale = target_longest_side / max(vb_w, vb_h)
+    raster_w = int(vb_w * scale)
+    raster_h = int(vb_h * scale)
+
+    # Render SVG to QImage
+    image = QImage(raster_w, raster_h, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.white)
+    painter = QPainter(image)
+    renderer.render(painter, QRectF(0, 0, raster_w, raster_h))
+    painter.end()
+    return image
+
+
+class _OverlaySignals(QObject):
+    # (room_id, cache_key, request_seq, QImage, its pixel buffer, (x0, y0))
+    ready = Signal(object)
+
+
+class _OverlayTask(QRunnable):
+    """Unpack and tint a room mask off the GUI thread.
+
+    Only the mask's bounding box is unpacked and tinted; the image is placed at
+    the box's top-left corner in the scene. QPixmap must be created on the GUI
+    thread, so only the QImage is built here; it is emitted along with the
+    buffer it aliases.
+    """
+
+    def __init__(self, signals: _OverlaySignals, room_id: int, mask: PackedMask,
+                 color: QColor, cache_key: tuple[int, int], seq: int):
+        super().__init__()
+        self.signals = signals
+        self.room_id = room_id
+        self.mask = mask
+        self.color = QColor(color)
+        self.cache_key = cache_key
+        self.seq = seq
+
+    def run(self):
+        x0, y0, x1, y1 = self.mask.bbox
+        image, buf = _render_overlay_image(self.mask.crop(y0, y1, x0, x1), self.color)
+        self.signals.ready.emit((self.room_id, self.cache_key, self.seq, image, buf, (x0, y0)))
+
 
 class FloorPlanCanvas(QGraphicsView):
     room_clicked = Signal(int, int)  # pixel x, y on the raster image
     split_line_complete = Signal(int, int, int, int)  # p1x, p1y, p2x, p2y
 
+    # (abspath, mtime, target_longest_side) -> rendered base pixmap, LRU order
+    _svg_pixmap_cache: OrderedDict[tuple, QPixmap] = OrderedDict()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._scene = QGraphicsScene(self)
@@ -47,6 +147,29 @@ class FloorPlanCanvas(QGraphicsView):
 
         self._base_pixmap_item: QGraphicsPixmapItem | None = None
         self._overlay_items: dict[int, QGraphicsPixmapItem] = {}  # room_id -> overlay
+        # (room_id, color rgba) -> (rendered overlay, pixel buffer it aliases),
+        # so recoloring a room back to a previously used color swaps pixmaps
+        # instead of re-rasterizing. Every displayed overlay pixmap is in here,
+        # which is what keeps its buffer alive.
+        self._overlay_pixmap_cache: dict[tuple[int, int], tuple[QPixmap, np.ndarray]] = {}
+        # Overlay tinting runs on a private pool; room_id -> (sequence number,
+        # cache key) of its latest request. Results for removed overlays are
+        # dropped; superseded ones are only cached, not shown.
+        self._overlay_pool = QThreadPool(self)
+        # One worker is plenty: the GUI-thread pixmap upload dominates
+        self._overlay_pool.setMaxThreadCount(1)
+        self._overlay_signals = _OverlaySignals()
+        self._overlay_signals.ready.connect(self._on_overlay_ready)
+        self._overlay_pending: dict[int, tuple[int, tuple[int, int]]] = {}
+        self._overlay_seq = 0
+        # Saved rooms never change color again, so instead of an item per room
+        # they share one layer: a per-pixel unit color index (0 = none) that
+        # Qt renders through _UNIT_COLOR_TABLE
+        self._unit_labels: np.ndarray | None = None
+        self._unit_layer_item: QGraphicsPixmapItem | None = None
+        self._unit_layer_pixmap: QPixmap | None = None
+        # saved room_id -> (mask, color index), in the order they were drawn
+        self._unit_rooms: dict[int, tuple[PackedMask, int]] = {}
         self._raster_w = 0
         self._raster_h = 0
         self._panning = False
@@ -58,6 +181,7 @@ class FloorPlanCanvas(QGraphicsView):
         self._split_p1: tuple[int, int] | None = None
         self._split_p2: tuple[int, int] | None = None
         self._split_contour: np.ndarray | None = None
+        self._split_snapper: ContourSnapper | None = None
         self._split_room_id: int | None = None
 
         # Split graphics items
@@ -65,81 +189,221 @@ class FloorPlanCanvas(QGraphicsView):
         self._split_final_line: QGraphicsLineItem | None = None
         self._split_point_items: list[QGraphicsEllipseItem] = []
         self._split_half_overlays: dict[str, QGraphicsPixmapItem] = {}
+        self._split_half_buffers: dict[str, np.ndarray] = {}  # pixels aliased by the overlays
+
+        # Live preview line updates are throttled to one per frame; mouse moves
+        # in between only record the latest cursor pixel
+        self._preview_pos: tuple[int, int] | None = None
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(16)
+        self._preview_timer.timeout.connect(self._update_split_preview_line)
 
         # Enable mouse tracking for live preview line
         self.setMouseTracking(True)
 
-    def load_svg(self, svg_path: str, target_longest_side: int = 2000) -> tuple[int, int]:
+    @staticmethod
+    def _svg_cache_key(svg_path: str, target_longest_side: int) -> tuple:
+        return (os.path.abspath(svg_path), os.path.getmtime(svg_path), target_longest_side)
+
+    @classmethod
+    def has_cached_svg(cls, svg_path: str, target_longest_side: int = 2000) -> bool:
+        """Whether load_svg would reuse a cached render for this file and size."""
+        return cls._svg_cache_key(svg_path, target_longest_side) in cls._svg_pixmap_cache
+
+    def load_svg(self, svg_path: str, target_longest_side: int = 2000,
+                 image: QImage | None = None) -> tuple[int, int]:
         """Load an SVG file and render it to a raster image for display.
 
-        Returns (raster_width, raster_height).
+        `image` may be a render_svg_image() result prepared off the GUI thread;
+        otherwise the SVG is rendered here. Returns (raster_width, raster_height).
+        Rendered pixmaps are cached per (file, mtime, target size), so reopening
+        an unchanged file skips rendering.
         """
-        renderer = QSvgRenderer(svg_path)
-        vb = renderer.viewBox()
-        vb_w, vb_h = vb.width(), vb.height()
-
-        # Compute scale to make longest side = target
-        scale = target_longest_side / max(vb_w, vb_h)
-        self._raster_w = int(vb_w * scale)
-        self._raster_h = int(vb_h * scale)
-
-        # Render SVG to QImage
-        image = QImage(self._raster_w, self._raster_h, QImage.Format.Format_ARGB32)
-        image.fill(Qt.GlobalColor.white)
-        painter = QPainter(image)
-        renderer.render(painter, QRectF(0, 0, self._raster_w, self._raster_h))
-        painter.end()
-
-        pixmap = QPixmap.fromImage(image)
-        self._scene.clear()
-        self._overlay_items.clear()
+        cache = FloorPlanCanvas._svg_pixmap_cache
+        key = self._svg_cache_key(svg_path, target_longest_side)
+        pixmap = cache.get(key)
+        if pixmap is not None:
+            cache.move_to_end(key)
+        else:
+            if image is None:
+                image = render_svg_image(svg_path, target_longest_side)
+            pixmap = QPixmap.fromImage(image)
+            cache[key] = pixmap
+            if len(cache) > SVG_PIXMAP_CACHE_SIZE:
+                cache.popitem(last=False)
+
+        self._raster_w = pixmap.width()
+        self._raster_h = pixmap.height()
+        self.clear()
+        self._unit_labels = np.zeros((self._raster_h, self._raster_w), dtype=np.uint8)
         self._base_pixmap_item = self._scene.addPixmap(pixmap)
         self._scene.setSceneRect(QRectF(0, 0, self._raster_w, self._raster_h))
         self.fitInView(self._scene.sceneRect(), Qt.AspectRatioMode.KeepAspectRatio)
 
         return (self._raster_w, self._raster_h)
 
-    def add_room_overlay(self, room_id: int, mask: np.ndarray, unit_id: int | None = None, color: QColor | None = None):
-        """Add a semi-transparent colored overlay for a room."""
-        if color is not None:
-            pass  # use explicit color
-        elif unit_id is not None:
-            color = UNIT_COLORS[unit_id % len(UNIT_COLORS)]
-        else:
-            color = SELECTED_ROOM_COLOR
+    def add_room_overlay(self, room_id: int, mask: PackedMask, unit_id: int | None = None, color: QColor | None = None):
+        """Add a semi-transparent colored overlay for a room.
 
-        h, w = mask.shape
+        Rooms with a unit_id (and no explicit color) are drawn on the shared
+        saved-room layer. Other cached overlays are shown immediately; otherwise
+        the mask is tinted on the overlay thread pool and shown when ready.
+        """
+        if color is None and unit_id is not None:
+            self.update_room_overlays_color([(room_id, mask, unit_id)])
+            return
+        if color is None:
+            color = SELECTED_ROOM_COLOR
 
-        # Build BGRA buffer directly via numpy (QImage Format_ARGB32 is BGRA in memory)
-        rgba = np.zeros((h, w, 4), dtype=np.uint8)
-        rgba[mask, 0] = color.blue()
-        rgba[mask, 1] = color.green()
-        rgba[mask, 2] = color.red()
-        rgba[mask, 3] = color.alpha()
+        cache_key = (room_id, color.rgba())
+        cached = self._overlay_pixmap_cache.get(cache_key)
+        if cached is None:
+            pending = self._overlay_pending.get(room_id)
+            if pending is not None and pending[1] == cache_key:
+                return  # the same tint is already queued and is shown when ready
+            self._overlay_seq += 1
+            self._overlay_pending[room_id] = (self._overlay_seq, cache_key)
+            self._overlay_pool.start(_OverlayTask(
+                self._overlay_signals, room_id, mask, color, cache_key, self._overlay_seq,
+            ))
+            return
 
-        overlay = QImage(rgba.data, w, h, w * 4, QImage.Format.Format_ARGB32)
-        # QImage doesn't own the buffer, so we must copy before rgba goes out of scope
-        overlay = overlay.copy()
+        self._overlay_pending.pop(room_id, None)
+        self._set_room_overlay_pixmap(room_id, cached[0], mask.bbox[:2])
 
-        pixmap = QPixmap.fromImage(overlay)
+    def _on_overlay_ready(self, result: tuple):
+        room_id, cache_key, seq, image, buf, offset = result
+        pending = self._overlay_pending.get(room_id)
+        if pending is None:
+            return  # the overlay was removed (or already shown from the cache)
 
-        # Remove old overlay for this room if exists
+        pixmap = QPixmap.fromImage(image)
+        self._overlay_pixmap_cache[cache_key] = (pixmap, buf)
+        if pending[0] != seq:
+            return  # superseded by a newer request; kept for when the color returns
+        del self._overlay_pending[room_id]
+        self._set_room_overlay_pixmap(room_id, pixmap, offset)
+
+    def _set_room_overlay_pixmap(self, room_id: int, pixmap: QPixmap, offset: tuple[int, int]):
+        # Reuse the existing item for this room if there is one (a room's
+        # bbox never changes, so neither does its offset)
         if room_id in self._overlay_items:
-            self._scene.removeItem(self._overlay_items[room_id])
+            self._overlay_items[room_id].setPixmap(pixmap)
+            return
 
         item = self._scene.addPixmap(pixmap)
+        item.setOffset(*offset)  # pixmap covers only the room's bbox
         item.setZValue(1)  # Above the base image
         self._overlay_items[room_id] = item
 
     def remove_room_overlay(self, room_id: int):
+        self._remove_room_item(room_id)
+        entry = self._unit_rooms.pop(room_id, None)
+        if entry is not None:
+            mask = entry[0]
+            x0, y0, x1, y1 = mask.bbox
+            self._unit_labels[y0:y1, x0:x1][mask.crop(y0, y1, x0, x1)] = 0
+            # Redraw saved rooms that may have shared those pixels
+            for other, index in self._unit_rooms.values():
+                ox0, oy0, ox1, oy1 = other.bbox
+                if ox0 < x1 and x0 < ox1 and oy0 < y1 and y0 < oy1:
+                    self._paint_unit_room(other, index)
+            self._refresh_unit_layer(mask.bbox)
+
+    def _remove_room_item(self, room_id: int):
+        """Drop a room's own overlay item, pending tint and cached pixmaps."""
+        self._overlay_pending.pop(room_id, None)
         if room_id in self._overlay_items:
             self._scene.removeItem(self._overlay_items[room_id])
             del self._overlay_items[room_id]
+        for key in [k for k in self._overlay_pixmap_cache if k[0] == room_id]:
+            del self._overlay_pixmap_cache[key]
+
+    def _refresh_unit_layer(self, bbox: tuple[int, int, int, int] | None = None):
+        """Re-render the saved-room layer from the unit label image.
+
+        With a bbox (x0, y0, x1, y1), only that region of the existing layer is
+        redrawn; otherwise the whole layer is rendered.
+        """
+        if bbox is None or self._unit_layer_pixmap is None:
+            h, w = self._unit_labels.shape
+            x0 = y0 = 0
+            labels = self._unit_labels
+        else:
+            x0, y0, x1, y1 = bbox
+            h, w = y1 - y0, x1 - x0
+            labels = np.ascontiguousarray(self._unit_labels[y0:y1, x0:x1])
+        # Indexed8 applies the color table during conversion, so the palette
+        # lookup needs no intermediate ARGB buffer
+        image = QImage(labels.data, w, h, w, QImage.Format.Format_Indexed8)
+        image.setColorTable(_UNIT_COLOR_TABLE)
+
+        if labels is self._unit_labels:
+            self._unit_layer_pixmap = QPixmap.fromImage(image)
+        else:
+            # Release the item's reference first, so painting into the shared
+            # pixmap doesn't detach (copy) the whole layer
+            self._unit_layer_item.setPixmap(QPixmap())
+            painter = QPainter(self._unit_layer_pixmap)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+            painter.drawImage(x0, y0, image)
+            painter.end()
+
+        if self._unit_layer_item is None:
+            self._unit_layer_item = self._scene.addPixmap(self._unit_layer_pixmap)
+            self._unit_layer_item.setZValue(1)  # Above the base image
+        else:
+            self._unit_layer_item.setPixmap(self._unit_layer_pixmap)
 
-    def update_room_overlay_color(self, room_id: int, mask: np.ndarray, unit_id: int):
+    def clear(self):
+        """Remove the base image, all room overlays and cached overlay pixmaps."""
+        self._scene.clear()
+        self._overlay_items.clear()
+        self._overlay_pixmap_cache.clear()
+        self._overlay_pending.clear()
+        self._unit_rooms.clear()
+        self._unit_layer_item = None
+        self._unit_layer_pixmap = None
+        self._base_pixmap_item = None
+
+    @contextmanager
+    def batched_updates(self):
+        """Suspend repaints for a batch of scene changes, then repaint once."""
+        self.setUpdatesEnabled(False)
+        try:
+            yield
+        finally:
+            self.setUpdatesEnabled(True)
+            self.viewport().update()
+
+    def update_room_overlay_color(self, room_id: int, mask: PackedMask, unit_id: int):
         """Update a room overlay's color (e.g., when assigned to a unit)."""
         self.add_room_overlay(room_id, mask, unit_id)
 
+    def update_room_overlays_color(self, entries: list[tuple[int, PackedMask, int]]):
+        """Move several rooms onto the saved-room layer in their unit colors.
+
+        entries: list of (room_id, mask, unit_id). The layer is re-rendered once
+        and the viewport repainted once for the whole batch.
+        """
+        with self.batched_updates():
+            dirty = None
+            for room_id, mask, unit_id in entries:
+                self._remove_room_item(room_id)
+                index = unit_id % len(UNIT_COLORS) + 1
+                self._paint_unit_room(mask, index)
+                self._unit_rooms[room_id] = (mask, index)
+                dirty = mask.bbox if dirty is None else _bbox_union(dirty, mask.bbox)
+            if dirty is not None:
+                self._refresh_unit_layer(dirty)
+
+    def _paint_unit_room(self, mask: PackedMask, index: int):
+        # Only the mask's bbox is unpacked; a pixel shared by several saved
+        # rooms shows the most recently painted one
+        x0, y0, x1, y1 = mask.bbox
+        self._unit_labels[y0:y1, x0:x1][mask.crop(y0, y1, x0, x1)] = index
+
     # --- Split mode methods ---
 
     def enter_split_mode(self, room_id: int, contour: np.ndarray):
@@ -148,7 +412,9 @@ class FloorPlanCanvas(QGraphicsView):
         self._split_state = "IDLE"
         self._split_p1 = None
         self._split_p2 = None
-        self._split_contour = contour
+        # Snapped against on every preview update, so index the contour once
+        self._split_snapper = ContourSnapper(contour)
+        self._split_contour = self._split_snapper.contour
         self._split_room_id = room_id
         self.setCursor(Qt.CursorShape.CrossCursor)
 
@@ -159,6 +425,7 @@ class FloorPlanCanvas(QGraphicsView):
         self._split_p1 = None
         self._split_p2 = None
         self._split_contour = None
+        self._split_snapper = None
         self._split_room_id = None
         self._clear_split_graphics()
         self.setCursor(Qt.CursorShape.ArrowCursor)
@@ -173,6 +440,8 @@ class FloorPlanCanvas(QGraphicsView):
 
     def _clear_split_graphics(self):
         """Remove all split-related graphics items from the scene."""
+        self._preview_timer.stop()
+        self._preview_pos = None
         if self._split_preview_line is not None:
             self._scene.removeItem(self._split_preview_line)
             self._split_preview_line = None
@@ -185,6 +454,7 @@ class FloorPlanCanvas(QGraphicsView):
         for key in list(self._split_half_overlays.keys()):
             self._scene.removeItem(self._split_half_overlays[key])
         self._split_half_overlays.clear()
+        self._split_half_buffers.clear()
 
     def show_split_preview(self, half_a: np.ndarray, half_b: np.ndarray):
         """Show cyan/magenta overlays for the two split halves."""
@@ -196,23 +466,22 @@ class FloorPlanCanvas(QGraphicsView):
             ("a", (half_a, SPLIT_HALF_A_COLOR)),
             ("b", (half_b, SPLIT_HALF_B_COLOR)),
         ]:
-            h, w = mask.shape
-            rgba = np.zeros((h, w, 4), dtype=np.uint8)
-            rgba[mask, 0] = color.blue()
-            rgba[mask, 1] = color.green()
-            rgba[mask, 2] = color.red()
-            rgba[mask, 3] = color.alpha()
-
-            overlay = QImage(rgba.data, w, h, w * 4, QImage.Format.Format_ARGB32)
-            overlay = overlay.copy()
-            pixmap = QPixmap.fromImage(overlay)
-
             if key in self._split_half_overlays:
-                self._scene.removeItem(self._split_half_overlays[key])
+                self._scene.removeItem(self._split_half_overlays.pop(key))
+                del self._split_half_buffers[key]
+            if not mask.any():
+                continue
+
+            # Tint only the half's bbox and place it at the bbox corner
+            x0, y0, x1, y1 = mask_bbox(mask)
+            image, buf = _render_overlay_image(mask[y0:y1, x0:x1], color)
+            pixmap = QPixmap.fromImage(image)
 
             item = self._scene.addPixmap(pixmap)
+            item.setOffset(x0, y0)
             item.setZValue(2)
             self._split_half_overlays[key] = item
+            self._split_half_buffers[key] = buf
 
     def _add_split_point_dot(self, px: int, py: int):
         """Draw a small red dot at a split point."""
@@ -255,7 +524,7 @@ class FloorPlanCanvas(QGraphicsView):
 
             # Split mode takes precedence
             if self._split_mode and self._split_contour is not None:
-                snapped = snap_to_contour((px, py), self._split_contour)
+                snapped = self._split_snapper.snap((px, py))
 
                 if self._split_state == "IDLE":
                     self._split_p1 = snapped
@@ -320,23 +589,33 @@ class FloorPlanCanvas(QGraphicsView):
             scene_pos = self.mapToScene(event.position().toPoint())
             mx = int(scene_pos.x())
             my = int(scene_pos.y())
-            if 0 <= mx < self._raster_w and 0 <= my < self._raster_h:
-                snapped = snap_to_contour((mx, my), self._split_contour)
-                line = QLineF(
-                    QPointF(self._split_p1[0], self._split_p1[1]),
-                    QPointF(snapped[0], snapped[1]),
-                )
-                if self._split_preview_line is not None:
-                    self._split_preview_line.setLine(line)
-                else:
-                    pen = QPen(QColor(255, 0, 0, 150), 1, Qt.PenStyle.DashLine)
-                    self._split_preview_line = self._scene.addLine(line, pen)
-                    self._split_preview_line.setZValue(3)
+            if (0 <= mx < self._raster_w and 0 <= my < self._raster_h
+                    and (mx, my) != self._preview_pos):
+                self._preview_pos = (mx, my)
+                if not self._preview_timer.isActive():
+                    self._preview_timer.start()
             event.accept()
             return
 
         super().mouseMoveEvent(event)
 
+    def _update_split_preview_line(self):
+        """Snap the latest cursor position and move the preview line to it."""
+        if (self._split_state != "FIRST_CLICK" or self._preview_pos is None
+                or self._split_p1 is None or self._split_contour is None):
+            return
+        snapped = self._split_snapper.snap(self._preview_pos)
+        line = QLineF(
+            QPointF(self._split_p1[0], self._split_p1[1]),
+            QPointF(snapped[0], snapped[1]),
+        )
+        if self._split_preview_line is not None:
+            self._split_preview_line.setLine(line)
+        else:
+            pen = QPen(QColor(255, 0, 0, 150), 1, Qt.PenStyle.DashLine)
+            self._split_preview_line = self._scene.addLine(line, pen)
+            self._split_preview_line.setZValue(3)
+
     def mouseReleaseEvent(self, event: QMouseEvent):
         if event.button() == Qt.MouseButton.RightButton and self._panning:
             self._panning = False
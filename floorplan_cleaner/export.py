@@ -2,11 +2,13 @@ import os
 import re
 import json
 import shutil
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
 from PIL import Image
 
-from .models import Room, ApartmentUnit
+from .models import Room, ApartmentUnit, PackedMask
 from .flood_fill import FloodFiller
 from .room_splitter import mask_to_contour
 
@@ -22,29 +24,75 @@ INITIAL_EPSILON_PX = 3.0
 # Maximum epsilon to prevent over-simplification (in pixels)
 MAX_EPSILON_PX = 30.0
 
+# Bisection limits when searching epsilon between the two bounds above
+EPSILON_SEARCH_STEPS = 6
+EPSILON_TOLERANCE_PX = 0.25
+
 # Margin around unit bbox for overview SVG (in SVG units)
 OVERVIEW_MARGIN_SVG = 5.0
 
+# RGB colors for rooms in the unit overview PNG, cycled per room
+UNIT_PNG_COLORS = (
+    (100, 180, 255),
+    (100, 255, 150),
+    (255, 180, 100),
+    (200, 130, 255),
+    (255, 255, 100),
+    (255, 130, 130),
+)
+
+# Root attributes rewritten in each unit's overview SVG
+_VIEWBOX_RE = re.compile(r'viewBox="[^"]*"')
+_WIDTH_MM_RE = re.compile(r'width="[\d.]+mm"')
+_HEIGHT_MM_RE = re.compile(r'height="[\d.]+mm"')
+
+
+# Room mask -> its simplified contour in pixels. Masks are never modified, so
+# re-exports reuse the contour; entries go away with their masks.
+_contour_cache: weakref.WeakKeyDictionary[PackedMask, np.ndarray] = weakref.WeakKeyDictionary()
+
 
 def _simplify_contour(contour_px: np.ndarray) -> np.ndarray:
     """Simplify a contour to at most MAX_VERTICES vertices.
 
-    Uses cv2.approxPolyDP with increasing epsilon until vertex count <= MAX_VERTICES.
-    Falls back to convex hull if epsilon gets too large.
+    Uses cv2.approxPolyDP at INITIAL_EPSILON_PX, and if that leaves too many
+    vertices, bisects epsilon up to MAX_EPSILON_PX for the smallest value that
+    meets the cap. Falls back to the MAX_EPSILON_PX result if even that is over.
     """
+    # Fast path for plain rectangular rooms: the compressed chain is just the
+    # four corners, and with both sides longer than epsilon approxPolyDP
+    # returns them unchanged
+    if len(contour_px) == 4:
+        xs, ys = contour_px[:, 0], contour_px[:, 1]
+        x0, x1, y0, y1 = xs.min(), xs.max(), ys.min(), ys.max()
+        if (min(x1 - x0, y1 - y0) > INITIAL_EPSILON_PX
+                and np.all((xs == x0) | (xs == x1)) and np.all((ys == y0) | (ys == y1))):
+            return contour_px.astype(np.float32)
+
     contour_f = contour_px.astype(np.float32).reshape(-1, 1, 2)
 
-    epsilon = INITIAL_EPSILON_PX
-    while epsilon <= MAX_EPSILON_PX:
-        simplified = cv2.approxPolyDP(contour_f, epsilon, closed=True)
+    simplified = cv2.approxPolyDP(contour_f, INITIAL_EPSILON_PX, closed=True)
+    if len(simplified) <= MAX_VERTICES:
+        return simplified.reshape(-1, 2)
+
+    # Best we can do without convex hull if max epsilon is still over the cap
+    best = cv2.approxPolyDP(contour_f, MAX_EPSILON_PX, closed=True)
+    if len(best) > MAX_VERTICES:
+        return best.reshape(-1, 2)
+
+    # Vertex count does not grow with epsilon, so bisect between a failing
+    # and a passing epsilon and keep the tightest passing polygon
+    lo, hi = INITIAL_EPSILON_PX, MAX_EPSILON_PX
+    for _ in range(EPSILON_SEARCH_STEPS):
+        if hi - lo < EPSILON_TOLERANCE_PX:
+            break
+        mid = (lo + hi) / 2.0
+        simplified = cv2.approxPolyDP(contour_f, mid, closed=True)
         if len(simplified) <= MAX_VERTICES:
-            return simplified.reshape(-1, 2)
-        epsilon *= 1.5
-
-    # If we still have too many vertices after max epsilon,
-    # use the last result from max epsilon (best we can do without convex hull)
-    simplified = cv2.approxPolyDP(contour_f, MAX_EPSILON_PX, closed=True)
-    return simplified.reshape(-1, 2)
+            hi, best = mid, simplified
+        else:
+            lo = mid
+    return best.reshape(-1, 2)
 
 
 def _extract_boundary_meters(room: Room, filler: FloodFiller):
@@ -53,21 +101,23 @@ def _extract_boundary_meters(room: Room, filler: FloodFiller):
     Coordinate mapping: SVG x -> X, SVG y -> -Z (SVG y points down, Z points up).
 
     Returns:
-        vertices_m: list of [x, z] in meters (centered)
+        vertices_m: Nx2 array of [x, z] in meters (centered, rounded to cm)
         center_offset: (cx, cz) the midpoint offset subtracted for centering
     """
-    contour_px = mask_to_contour(room.flood_mask)
-    simplified = _simplify_contour(contour_px)
-
-    # Convert pixel -> SVG -> meters
-    vertices_m = []
-    for px, py in simplified:
-        sx, sy = filler.pixel_to_svg(int(px), int(py))
-        mx = sx * SVG_TO_METERS
-        mz = -sy * SVG_TO_METERS
-        vertices_m.append([mx, mz])
-
-    vertices_m = np.array(vertices_m)
+    simplified = _contour_cache.get(room.flood_mask)
+    if simplified is None:
+        # Trace only the room's bbox region of the packed mask and shift back.
+        # Douglas-Peucker only ever keeps corner points, so the compressed
+        # chain simplifies to the same polygon from far fewer input points
+        x0, y0, x1, y1 = room.flood_mask.bbox
+        contour = mask_to_contour(room.flood_mask.crop(y0, y1, x0, x1), compress=True) + (x0, y0)
+        simplified = _simplify_contour(contour)
+        _contour_cache[room.flood_mask] = simplified
+
+    # Convert pixel -> SVG -> meters for all vertices at once. approxPolyDP
+    # keeps a subset of the integer contour points, so no rounding is needed.
+    vertices_svg = filler.pixels_to_svg(simplified.astype(np.float64))
+    vertices_m = vertices_svg * np.array([SVG_TO_METERS, -SVG_TO_METERS])
 
     # Center at bounding box midpoint
     min_coords = vertices_m.min(axis=0)
@@ -78,9 +128,7 @@ def _extract_boundary_meters(room: Room, filler: FloodFiller):
     vertices_m[:, 0] -= cx
     vertices_m[:, 1] -= cz
 
-    vertices_m = np.round(vertices_m, 2).tolist()
-
-    return vertices_m, (cx, cz)
+    return np.round(vertices_m, 2), (cx, cz)
 
 
 def _map_room_type_for_output(label: str) -> str:
@@ -102,11 +150,8 @@ def _compute_unit_bbox_svg(unit_rooms: list[Room]) -> tuple[float, float, float,
     return (min_x, min_y, max_x - min_x, max_y - min_y)
 
 
-def _export_unit_svg(svg_path: str, unit_rooms: list[Room], output_path: str):
-    """Export a cropped SVG showing only the unit's area."""
-    with open(svg_path, "r", encoding="utf-8") as f:
-        svg_text = f.read()
-
+def _export_unit_svg(svg_text: str, unit_rooms: list[Room], output_path: str):
+    """Export a cropped copy of the source SVG text showing only the unit's area."""
     bx, by, bw, bh = _compute_unit_bbox_svg(unit_rooms)
 
     new_vb_x = bx - OVERVIEW_MARGIN_SVG
@@ -115,56 +160,44 @@ def _export_unit_svg(svg_path: str, unit_rooms: list[Room], output_path: str):
     new_vb_h = bh + 2 * OVERVIEW_MARGIN_SVG
 
     new_vb_str = f"{new_vb_x} {new_vb_y} {new_vb_w} {new_vb_h}"
-    svg_text = re.sub(r'viewBox="[^"]*"', f'viewBox="{new_vb_str}"', svg_text)
+    svg_text = _VIEWBOX_RE.sub(f'viewBox="{new_vb_str}"', svg_text)
 
     # Update width/height to match new viewBox
-    if re.search(r'width="[\d.]+mm"', svg_text):
-        svg_text = re.sub(r'width="[\d.]+mm"', f'width="{new_vb_w}mm"', svg_text)
-        svg_text = re.sub(r'height="[\d.]+mm"', f'height="{new_vb_h}mm"', svg_text)
+    svg_text, n_width = _WIDTH_MM_RE.subn(f'width="{new_vb_w}mm"', svg_text)
+    if n_width:
+        svg_text = _HEIGHT_MM_RE.sub(f'height="{new_vb_h}mm"', svg_text)
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(svg_text)
 
 
-def _export_unit_png(filler: FloodFiller, unit_rooms: list[Room], output_path: str):
-    """Export a PNG showing the unit's boundary image with room masks overlaid."""
-    base = filler.boundary_image.copy()
+def _render_unit_png(filler: FloodFiller, unit_rooms: list[Room]) -> np.ndarray:
+    """Render the unit's boundary image with room masks overlaid, as RGB."""
+    base = filler.boundary_image  # only read; the crop below is converted to a new RGB array
 
-    # Compute pixel bounding box of all rooms
-    all_ys = []
-    all_xs = []
-    for room in unit_rooms:
-        ys, xs = room.flood_mask.nonzero()
-        all_ys.append(ys)
-        all_xs.append(xs)
-    all_ys = np.concatenate(all_ys)
-    all_xs = np.concatenate(all_xs)
+    # Compute pixel bounding box of all rooms from their stored bounds
+    bx0 = min(room.flood_mask.bbox[0] for room in unit_rooms)
+    by0 = min(room.flood_mask.bbox[1] for room in unit_rooms)
+    bx1 = max(room.flood_mask.bbox[2] for room in unit_rooms)
+    by1 = max(room.flood_mask.bbox[3] for room in unit_rooms)
 
     margin_px = 20
-    y_min = max(0, int(all_ys.min()) - margin_px)
-    y_max = min(base.shape[0], int(all_ys.max()) + margin_px)
-    x_min = max(0, int(all_xs.min()) - margin_px)
-    x_max = min(base.shape[1], int(all_xs.max()) + margin_px)
+    y_min = max(0, by0 - margin_px)
+    y_max = min(base.shape[0], by1 - 1 + margin_px)
+    x_min = max(0, bx0 - margin_px)
+    x_max = min(base.shape[1], bx1 - 1 + margin_px)
 
     crop = base[y_min:y_max, x_min:x_max]
-    rgb = cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB)
-
-    colors = [
-        (100, 180, 255),
-        (100, 255, 150),
-        (255, 180, 100),
-        (200, 130, 255),
-        (255, 255, 100),
-        (255, 130, 130),
-    ]
-    for i, room in enumerate(unit_rooms):
-        room_crop = room.flood_mask[y_min:y_max, x_min:x_max]
-        color = colors[i % len(colors)]
-        overlay = np.zeros_like(rgb)
-        overlay[room_crop] = color
-        rgb = cv2.addWeighted(rgb, 1.0, overlay, 0.35, 0)
+    # Gray -> RGB by copying a broadcast view: one allocation, no cv2 round trip
+    rgb = np.broadcast_to(crop[..., None], crop.shape + (3,)).copy()
 
-    Image.fromarray(rgb).save(output_path)
+    # Paint all rooms into one overlay and blend it in a single pass. A unit's
+    # rooms don't overlap, so this matches blending each room on its own.
+    overlay = np.zeros_like(rgb)
+    for i, room in enumerate(unit_rooms):
+        room_crop = room.flood_mask.crop(y_min, y_max, x_min, x_max)
+        overlay[room_crop] = UNIT_PNG_COLORS[i % len(UNIT_PNG_COLORS)]
+    return cv2.addWeighted(rgb, 1.0, overlay, 0.35, 0)
 
 
 class Exporter:
@@ -188,80 +221,101 @@ class Exporter:
             "units": [],
         }
 
-        for unit in units:
-            unit_dir = os.path.join(base_dir, f"unit_{unit.id}")
-            os.makedirs(unit_dir, exist_ok=True)
-
-            unit_rooms = [r for r in rooms if r.unit_id == unit.id]
-
-            unit_entry = {
-                "unit_id": unit.id,
-                "rooms": [],
-            }
-
-            for room_idx, room in enumerate(unit_rooms, start=1):
-                output_room_type = _map_room_type_for_output(room.label)
-
-                # Extract boundary polygon in meters, centered at origin
-                vertices_m, (cx, cz) = _extract_boundary_meters(room, filler)
-
-                # Build bounds_top and bounds_bottom
-                # X = SVG x, Y = up (height), Z = -SVG y
-                bounds_top = [[v[0], height_m, v[1]] for v in vertices_m]
-                bounds_bottom = [[v[0], 0.0, v[1]] for v in vertices_m]
-
-                ssr = {
-                    "room_type": output_room_type,
-                    "bounds_top": bounds_top,
-                    "bounds_bottom": bounds_bottom,
-                    "objects": [],
-                }
-
-                # Use the output room type for the filename
-                type_str = output_room_type.replace("/", "_")
-                filename = f"unit_{unit.id}_room_{room_idx}_{type_str}.json"
-                filepath = os.path.join(unit_dir, filename)
-                relative_path = f"unit_{unit.id}/{filename}"
-
-                with open(filepath, "w") as f:
-                    json.dump(ssr, f, indent=4)
-
-                print(f"Saved: {filepath} | vertices: {len(vertices_m)}")
-
-                # Metadata keeps the original label for reconstruction
-                room_entry = {
-                    "room_id": room_idx,
-                    "room_type": room.label or "unlabelled",
-                    "output_file": relative_path,
-                    "center_offset_m": {
-                        "x": round(cx, 2),
-                        "z": round(cz, 2),
-                    },
-                    "bbox_in_svg": {
-                        "x": round(room.bbox_svg[0], 2),
-                        "y": round(room.bbox_svg[1], 2),
-                        "width": round(room.bbox_svg[2], 2),
-                        "height": round(room.bbox_svg[3], 2),
-                    },
+        # Bucket rooms by unit once instead of filtering all rooms per unit
+        rooms_by_unit: dict[int, list[Room]] = {}
+        for room in rooms:
+            rooms_by_unit.setdefault(room.unit_id, []).append(room)
+
+        # Every unit overview is cropped from the same source SVG
+        with open(svg_path, "r", encoding="utf-8") as f:
+            svg_text = f.read()
+
+        # PNG encoding is zlib-bound and releases the GIL, so overview PNGs are
+        # written on worker threads while the next unit is processed. Leaving
+        # the block waits for them, on error as well.
+        png_saves = []
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as png_pool:
+            for unit in units:
+                unit_dir = os.path.join(base_dir, f"unit_{unit.id}")
+                os.makedirs(unit_dir, exist_ok=True)
+
+                unit_rooms = rooms_by_unit.get(unit.id, [])
+
+                unit_entry = {
+                    "unit_id": unit.id,
+                    "rooms": [],
                 }
-                unit_entry["rooms"].append(room_entry)
-
-            # Export unit overview SVG
-            overview_svg_name = f"unit_{unit.id}_overview.svg"
-            overview_svg_path = os.path.join(unit_dir, overview_svg_name)
-            _export_unit_svg(svg_path, unit_rooms, overview_svg_path)
-            print(f"Saved: {overview_svg_path}")
-
-            # Export unit overview PNG
-            overview_png_name = f"unit_{unit.id}_overview.png"
-            overview_png_path = os.path.join(unit_dir, overview_png_name)
-            _export_unit_png(filler, unit_rooms, overview_png_path)
-            print(f"Saved: {overview_png_path}")
-
-            unit_entry["overview_svg"] = f"unit_{unit.id}/{overview_svg_name}"
-            unit_entry["overview_png"] = f"unit_{unit.id}/{overview_png_name}"
 
-            metadata["units"].append(unit_entry)
+                for room_idx, room in enumerate(unit_rooms, start=1):
+                    output_room_type = _map_room_type_for_output(room.label)
+
+                    # Extract boundary polygon in meters, centered at origin
+                    vertices_m, (cx, cz) = _extract_boundary_meters(room, filler)
+
+                    # Build bounds_top and bounds_bottom
+                    # X = SVG x, Y = up (height), Z = -SVG y
+                    xs, zs = vertices_m[:, 0], vertices_m[:, 1]
+                    bounds_top = np.column_stack([xs, np.full_like(xs, height_m), zs]).tolist()
+                    bounds_bottom = np.column_stack([xs, np.zeros_like(xs), zs]).tolist()
+
+                    ssr = {
+                        "room_type": output_room_type,
+                        "bounds_top": bounds_top,
+                        "bounds_bottom": bounds_bottom,
+                        "objects": [],
+                    }
+
+                    # Use the output room type for the filename
+                    type_str = output_room_type.replace("/", "_")
+                    filename = f"unit_{unit.id}_room_{room_idx}_{type_str}.json"
+                    filepath = os.path.join(unit_dir, filename)
+                    relative_path = f"unit_{unit.id}/{filename}"
+
+                    # json.dump writes every encoder chunk separately; encode
+                    # the document in one go and write it with a single call
+                    with open(filepath, "w") as f:
+                        f.write(json.dumps(ssr, indent=4))
+
+                    print(f"Saved: {filepath} | vertices: {len(vertices_m)}")
+
+                    # Metadata keeps the original label for reconstruction
+                    room_entry = {
+                        "room_id": room_idx,
+                        "room_type": room.label or "unlabelled",
+                        "output_file": relative_path,
+                        "center_offset_m": {
+                            "x": round(cx, 2),
+                            "z": round(cz, 2),
+                        },
+                        "bbox_in_svg": {
+                            "x": round(room.bbox_svg[0], 2),
+                            "y": round(room.bbox_svg[1], 2),
+                            "width": round(room.bbox_svg[2], 2),
+                            "height": round(room.bbox_svg[3], 2),
+                        },
+                    }
+                    unit_entry["rooms"].append(room_entry)
+
+                # Export unit overview SVG
+                overview_svg_name = f"unit_{unit.id}_overview.svg"
+                overview_svg_path = os.path.join(unit_dir, overview_svg_name)
+                _export_unit_svg(svg_text, unit_rooms, overview_svg_path)
+                print(f"Saved: {overview_svg_path}")
+
+                # Export unit overview PNG
+                overview_png_name = f"unit_{unit.id}_overview.png"
+                overview_png_path = os.path.join(unit_dir, overview_png_name)
+                overview = Image.fromarray(_render_unit_png(filler, unit_rooms))
+                png_saves.append((png_pool.submit(overview.save, overview_png_path), overview_png_path))
+
+                unit_entry["overview_svg"] = f"unit_{unit.id}/{overview_svg_name}"
+                unit_entry["overview_png"] = f"unit_{unit.id}/{overview_png_name}"
+
+                metadata["units"].append(unit_entry)
+
+        for future, png_path in png_saves:
+            future.result()  # re-raise write errors
+            print(f"Saved: {png_path}")
 
         # Copy preprocessed SVG to output root
         svg_dest = os.path.join(base_dir, input_name + "_centered.svg")
@@ -272,5 +326,5 @@ class Exporter:
         # Write metadata
         meta_path = os.path.join(base_dir, "metadata.json")
         with open(meta_path, "w") as f:
-            json.dump(metadata, f, indent=2)
+            f.write(json.dumps(metadata, indent=2))
         print(f"Saved: {meta_path}")
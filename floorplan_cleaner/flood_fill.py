@@ -5,6 +5,13 @@ from PySide6.QtCore import QRectF, Qt
 from PySide6.QtSvg import QSvgRenderer
 from .models import IfcElement
 
+# Closing kernel for small gaps left in the boundary raster
+_CLOSE_KERNEL = np.ones((5, 5), dtype=np.uint8)
+
+# Pixels a 3 px thick cv2 line/polyline stroke can cover beyond the bounding
+# box of its vertices
+STROKE_REACH = 2
+
 
 class FloodFiller:
     def __init__(self, viewbox: tuple[float, float, float, float], scale: float):
@@ -13,6 +20,15 @@ class FloodFiller:
         self.raster_w = int(viewbox[2] * scale)
         self.raster_h = int(viewbox[3] * scale)
         self.boundary_image: np.ndarray | None = None
+        # id(element) -> (element, its paths in pixel coords). viewbox and scale
+        # are fixed per filler, so each door/window is projected once and reused
+        # by every mask and split that touches it. Keyed by identity because
+        # SVG ids may be missing or repeated; holding the element keeps its id
+        # from being reused.
+        self._pixel_paths: dict[int, tuple[IfcElement, list[np.ndarray]]] = {}
+        # id(element) -> (element, (x0, y0, x1, y1), ys, xs): the pixels of its
+        # 3 px stroke and the box they were rasterized in
+        self._stroke_stamps: dict[int, tuple] = {}
 
     def build_boundary_raster(
         self,
@@ -36,7 +52,8 @@ class FloodFiller:
         renderer.render(painter, QRectF(0, 0, self.raster_w, self.raster_h))
         painter.end()
 
-        image = image.convertToFormat(QImage.Format.Format_RGB32)
+        # The white fill keeps every pixel opaque, so the ARGB32 bytes are read
+        # directly; converting to RGB32 first would only copy the raster
         ptr = image.bits()
         arr = np.frombuffer(ptr, dtype=np.uint8).reshape(self.raster_h, self.raster_w, 4)
         gray = cv2.cvtColor(arr, cv2.COLOR_BGRA2GRAY)
@@ -45,7 +62,7 @@ class FloodFiller:
         # Step 2: Draw wall element paths as thick lines to reinforce boundaries
         for elem in wall_elements:
             for path_coords in elem.paths:
-                pts = self._coords_to_pixels(path_coords)
+                pts = self.coords_to_pixels(path_coords)
                 if len(pts) < 2:
                     continue
                 cv2.polylines(binary, [pts], isClosed=False, color=0, thickness=4)
@@ -57,8 +74,7 @@ class FloodFiller:
         # (wall cross-sections, frames) so they blend with adjacent walls
         # at the correct thickness without creating artificial indentations.
         for elem in door_elements + window_elements:
-            for path_coords in elem.paths:
-                pts = self._coords_to_pixels(path_coords)
+            for path_coords, pts in zip(elem.paths, self.pixel_paths(elem)):
                 if len(pts) < 2:
                     continue
                 cv2.polylines(binary, [pts], isClosed=False, color=0, thickness=4)
@@ -66,19 +82,74 @@ class FloodFiller:
                     cv2.fillPoly(binary, [pts], 0)
 
         # Step 4: Morphological closing for remaining small gaps
-        kernel = np.ones((5, 5), dtype=np.uint8)
-        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=1)
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, _CLOSE_KERNEL, iterations=1)
 
         self.boundary_image = binary
         return binary
 
-    def _coords_to_pixels(self, coords: list[tuple[float, float]]) -> np.ndarray:
-        return np.array(
-            [(int((x - self.viewbox[0]) * self.scale),
-              int((y - self.viewbox[1]) * self.scale))
-             for x, y in coords],
-            dtype=np.int32
-        )
+    def coords_to_pixels(self, coords: list[tuple[float, float]]) -> np.ndarray:
+        """Vectorized svg_to_pixel for a path of (x, y) SVG coordinates, as int32 (N, 2)."""
+        # astype truncates toward zero like int() in svg_to_pixel
+        pts = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        return ((pts - self.viewbox[:2]) * self.scale).astype(np.int32)
+
+    def pixel_paths(self, elem: IfcElement) -> list[np.ndarray]:
+        """coords_to_pixels of each of elem's paths, cached per element."""
+        cached = self._pixel_paths.get(id(elem))
+        if cached is None:
+            cached = (elem, [self.coords_to_pixels(path_coords) for path_coords in elem.paths])
+            self._pixel_paths[id(elem)] = cached
+        return cached[1]
+
+    def stroke_pixels(self, elem: IfcElement, x0: int, y0: int, x1: int, y1: int
+                      ) -> tuple[np.ndarray, np.ndarray]:
+        """Pixels of elem's paths drawn as 3 px polylines into the window [x0, x1) x [y0, y1).
+
+        Returns (ys, xs) relative to the window origin, as cv2.polylines on a
+        canvas of that window would set them.
+        """
+        (sx0, sy0, sx1, sy1), ys, xs = self.stroke_stamp(elem)
+        if sx0 >= x0 and sy0 >= y0 and sx1 <= x1 and sy1 <= y1:
+            return ys + (sy0 - y0), xs + (sx0 - x0)
+
+        # cv2 clips strokes to the canvas, which moves pixels near its edge, so
+        # strokes crossing the window edge are rasterized against the window
+        # itself (limited to their own extent)
+        tx0, ty0 = max(x0, sx0), max(y0, sy0)
+        tx1, ty1 = min(x1, sx1), min(y1, sy1)
+        if tx0 >= tx1 or ty0 >= ty1:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        paths = [p for p in self.pixel_paths(elem) if len(p) >= 2]
+        tile = np.zeros((ty1 - ty0, tx1 - tx0), dtype=np.uint8)
+        offset = np.array([tx0, ty0], dtype=np.int32)  # keeps pts int32
+        cv2.polylines(tile, [p - offset for p in paths], isClosed=False,
+                      color=255, thickness=3)
+        ys, xs = np.nonzero(tile)
+        return ys + (ty0 - y0), xs + (tx0 - x0)
+
+    def stroke_stamp(self, elem: IfcElement) -> tuple:
+        """The element's 3 px stroke rasterized once over its own extent, cached per element.
+
+        Returns ((x0, y0, x1, y1), ys, xs) with ys/xs relative to (x0, y0).
+        """
+        cached = self._stroke_stamps.get(id(elem))
+        if cached is None:
+            paths = [p for p in self.pixel_paths(elem) if len(p) >= 2]
+            if paths:
+                vertices = np.concatenate(paths)
+                x0, y0 = (int(v) for v in vertices.min(axis=0) - STROKE_REACH)
+                x1, y1 = (int(v) for v in vertices.max(axis=0) + STROKE_REACH + 1)
+                tile = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+                offset = np.array([x0, y0], dtype=np.int32)  # keeps pts int32
+                cv2.polylines(tile, [p - offset for p in paths], isClosed=False,
+                              color=255, thickness=3)
+                ys, xs = np.nonzero(tile)
+            else:
+                x0 = y0 = x1 = y1 = 0
+                ys = xs = np.empty(0, dtype=np.intp)
+            cached = (elem, (x0, y0, x1, y1), ys, xs)
+            self._stroke_stamps[id(elem)] = cached
+        return cached[1:]
 
     def _is_closed_polygon(self, coords: list[tuple[float, float]]) -> bool:
         if len(coords) < 3:
@@ -87,11 +158,12 @@ class FloodFiller:
         dy = abs(coords[0][1] - coords[-1][1])
         return dx < 0.5 and dy < 0.5
 
-    def fill_at(self, px: int, py: int) -> np.ndarray | None:
+    def fill_at(self, px: int, py: int) -> tuple[np.ndarray, tuple] | None:
         """Flood-fill from pixel (px, py) on the boundary raster.
 
-        Returns a boolean mask of the filled region, or None if the click
-        is on a boundary or the fill is trivially small / too large.
+        Returns (mask, bbox) where mask is a boolean mask of the filled region
+        and bbox its (x0, y0, x1, y1) pixel bounds (end-exclusive), or None if the click is on a boundary or the fill is
+        trivially small / too large.
         """
         if self.boundary_image is None:
             raise RuntimeError("build_boundary_raster() must be called first")
@@ -102,19 +174,22 @@ class FloodFiller:
         if self.boundary_image[py, px] == 0:
             return None
 
-        fill_img = self.boundary_image.copy()
-        h, w = fill_img.shape
+        h, w = self.boundary_image.shape
         mask = np.zeros((h + 2, w + 2), dtype=np.uint8)
 
-        cv2.floodFill(fill_img, mask, (px, py), 128)
-        room_mask = (fill_img == 128)
-
-        area = np.sum(room_mask)
+        # Fill only the padded mask (with 1s, so it can be viewed as bool) and
+        # leave the boundary raster untouched. floodFill returns the number of
+        # filled pixels and their bounding rect, so no reductions are needed.
+        flags = 4 | (1 << 8) | cv2.FLOODFILL_MASK_ONLY
+        area, _, _, (rx, ry, rw, rh) = cv2.floodFill(
+            self.boundary_image, mask, (px, py), 0, flags=flags
+        )
         total = self.raster_w * self.raster_h
         if area < 100 or area > total * 0.8:
             return None
 
-        return room_mask
+        room_mask = mask[1:-1, 1:-1].view(bool)
+        return room_mask, (rx, ry, rx + rw, ry + rh)
 
     def svg_to_pixel(self, sx: float, sy: float) -> tuple[int, int]:
         px = int((sx - self.viewbox[0]) * self.scale)
@@ -125,3 +200,7 @@ class FloodFiller:
         sx = px / self.scale + self.viewbox[0]
         sy = py / self.scale + self.viewbox[1]
         return (sx, sy)
+
+    def pixels_to_svg(self, points: np.ndarray) -> np.ndarray:
+        """Vectorized pixel_to_svg for an (N, 2) array of (px, py) points."""
+        return points / self.scale + np.array(self.viewbox[:2])
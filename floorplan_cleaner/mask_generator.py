@@ -1,30 +1,41 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
 from .models import IfcElement, Room
-from .flood_fill import FloodFiller
+from .flood_fill import FloodFiller, STROKE_REACH
 
 # Margin in pixels to expand the crop region beyond the room mask bbox.
 # This ensures doors/windows sitting in the wall just outside the room
 # are captured by the dilated boundary zone.
 CROP_MARGIN = 15
 
+# Side length of the generated masks
+MASK_SIZE = 120
+
+# Boundary zone morphology: dilate out into the walls, erode off the interior
+_DILATE_KERNEL = np.ones((11, 11), dtype=np.uint8)
+_ERODE_KERNEL = np.ones((3, 3), dtype=np.uint8)
+
 
 class MaskGenerator:
     def __init__(self, filler: FloodFiller, doors: list[IfcElement], windows: list[IfcElement]):
         self.filler = filler
         self.doors = doors
         self.windows = windows
+        # (N, 4) pixel bboxes of each element list, for vectorized overlap tests
+        self._door_bboxes = self._element_pixel_bboxes(doors)
+        self._window_bboxes = self._element_pixel_bboxes(windows)
 
     def generate_mask(self, room: Room) -> np.ndarray:
         """Generate a 120x120 grayscale mask for a room.
 
         Pixel values: 0=void, 85=floor, 170=door, 255=window.
         """
-        full_mask = room.flood_mask
-        img_h, img_w = full_mask.shape
-        ys, xs = np.where(full_mask)
-        y_min, y_max = ys.min(), ys.max()
-        x_min, x_max = xs.min(), xs.max()
+        img_h, img_w = room.flood_mask.shape
+        x_min, y_min, x_max, y_max = room.flood_mask.bbox
+        x_max -= 1
+        y_max -= 1
 
         # Expand crop region by margin to capture doors/windows in adjacent walls
         y_min_ext = max(0, y_min - CROP_MARGIN)
@@ -32,7 +43,7 @@ class MaskGenerator:
         x_min_ext = max(0, x_min - CROP_MARGIN)
         x_max_ext = min(img_w - 1, x_max + CROP_MARGIN)
 
-        crop_mask = full_mask[y_min_ext:y_max_ext + 1, x_min_ext:x_max_ext + 1]
+        crop_mask = room.flood_mask.crop(y_min_ext, y_max_ext + 1, x_min_ext, x_max_ext + 1)
         h, w = crop_mask.shape
 
         # Start with void
@@ -41,61 +52,93 @@ class MaskGenerator:
         # Fill floor area
         result[crop_mask] = 85
 
-        # Build the room boundary zone for door/window detection:
-        # Dilate the mask outward and subtract eroded mask to get a boundary strip.
-        # The dilation extends into the wall region where doors/windows sit.
-        kernel_dilate = np.ones((11, 11), dtype=np.uint8)
-        kernel_erode = np.ones((3, 3), dtype=np.uint8)
-        dilated = cv2.dilate(crop_mask.astype(np.uint8), kernel_dilate, iterations=1)
-        eroded = cv2.erode(crop_mask.astype(np.uint8), kernel_erode, iterations=1)
-        boundary_zone = (dilated > 0) & (eroded == 0)
+        # Build the room boundary zone for door/window detection
+        boundary_zone = self._boundary_zone(crop_mask)
 
         # Overlay doors
-        self._overlay_elements(result, boundary_zone, self.doors, x_min_ext, y_min_ext, w, h, 170)
+        self._overlay_elements(result, boundary_zone, self.doors, self._door_bboxes,
+                               x_min_ext, y_min_ext, w, h, 170)
 
         # Overlay windows
-        self._overlay_elements(result, boundary_zone, self.windows, x_min_ext, y_min_ext, w, h, 255)
+        self._overlay_elements(result, boundary_zone, self.windows, self._window_bboxes,
+                               x_min_ext, y_min_ext, w, h, 255)
 
         # Overlay synthetic door at split boundary if this room was split
         if room.split_line_px is not None:
-            self._overlay_split_boundary(result, crop_mask, room.split_line_px,
+            self._overlay_split_boundary(result, boundary_zone, room.split_line_px,
                                          x_min_ext, y_min_ext, w, h)
 
-        # Pad to square
-        result = self._pad_to_square(result)
+        # Pad to square and resize to 120x120 with nearest-neighbor
+        return self._pad_and_resize(result)
 
-        # Resize to 120x120 with nearest-neighbor
-        result = cv2.resize(result, (120, 120), interpolation=cv2.INTER_NEAREST)
+    def generate_all(self, rooms: list[Room]) -> list[np.ndarray]:
+        """Generate the 120x120 mask of every room, in the order given.
 
-        return result
+        The per-room work is dominated by OpenCV calls that release the GIL, and
+        the generator's state is only read, so rooms are processed on a thread pool.
+        """
+        # Fill the filler's per-element stroke cache first, so the threads only
+        # read it instead of each rasterizing the same doors/windows
+        for elem in self.doors + self.windows:
+            self.filler.stroke_stamp(elem)
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            return list(pool.map(self.generate_mask, rooms))
+
+    def _boundary_zone(self, mask: np.ndarray) -> np.ndarray:
+        """Boundary strip of a boolean mask: dilated outward minus the eroded interior.
+
+        Returned as a 0/1 uint8 array. The dilation extends into the wall region
+        where doors/windows sit.
+        """
+        mask_u8 = mask.view(np.uint8)
+        dilated = cv2.dilate(mask_u8, _DILATE_KERNEL, iterations=1)
+        eroded = cv2.erode(mask_u8, _ERODE_KERNEL, iterations=1)
+        # eroded <= mask <= dilated, so a saturating subtract is dilated & ~eroded;
+        # written back into dilated to avoid a third buffer
+        return cv2.subtract(dilated, eroded, dst=dilated)
 
     def _overlay_elements(self, result: np.ndarray, boundary_zone: np.ndarray,
-                          elements: list[IfcElement], x_off: int, y_off: int,
-                          w: int, h: int, value: int):
-        """Render IFC elements onto the result mask where they intersect the room boundary."""
-        for elem in elements:
-            ebbox = self._element_pixel_bbox(elem)
-            ex, ey, ew, eh = ebbox
-            # Check bbox overlap with the extended crop region
-            if ex > x_off + w or ex + ew < x_off or ey > y_off + h or ey + eh < y_off:
+                          elements: list[IfcElement], bboxes: np.ndarray,
+                          x_off: int, y_off: int, w: int, h: int, value: int):
+        """Render IFC elements onto the result mask where they intersect the room boundary.
+
+        bboxes holds the elements' pixel bboxes (see _element_pixel_bboxes).
+        """
+        for i in self._near_elements(bboxes, x_off, y_off, w, h):
+            ys, xs = self.filler.stroke_pixels(elements[i], x_off, y_off, x_off + w, y_off + h)
+
+            # Only apply where the element intersects the boundary zone
+            keep = boundary_zone[ys, xs].view(bool)  # zone is 0/1
+            result[ys[keep], xs[keep]] = value
+
+    def _overlay_elements_local(self, result: np.ndarray, mask: np.ndarray,
+                                elements: list[IfcElement], bboxes: np.ndarray,
+                                x_off: int, y_off: int, w: int, h: int, value: int):
+        """_overlay_elements for a large crop, given the floor mask instead of its zone.
+
+        The boundary zone is only built around each element's stroke, padded by
+        the dilation reach, rather than over the whole crop.
+        """
+        reach = _DILATE_KERNEL.shape[0] // 2
+        for i in self._near_elements(bboxes, x_off, y_off, w, h):
+            ys, xs = self.filler.stroke_pixels(elements[i], x_off, y_off, x_off + w, y_off + h)
+            if len(ys) == 0:
                 continue
 
-            # Render element paths into a local mask
-            elem_mask = np.zeros((h, w), dtype=np.uint8)
-            for path_coords in elem.paths:
-                pts = np.array(
-                    [(int((x - self.filler.viewbox[0]) * self.filler.scale) - x_off,
-                      int((y - self.filler.viewbox[1]) * self.filler.scale) - y_off)
-                     for x, y in path_coords],
-                    dtype=np.int32
-                )
-                if len(pts) < 2:
-                    continue
-                cv2.polylines(elem_mask, [pts], isClosed=False, color=255, thickness=3)
+            y0, y1 = max(0, int(ys.min()) - reach), min(h, int(ys.max()) + reach + 1)
+            x0, x1 = max(0, int(xs.min()) - reach), min(w, int(xs.max()) + reach + 1)
+            zone = self._boundary_zone(mask[y0:y1, x0:x1])
 
             # Only apply where the element intersects the boundary zone
-            overlap = (elem_mask > 0) & boundary_zone
-            result[overlap] = value
+            keep = zone[ys - y0, xs - x0].view(bool)  # zone is 0/1
+            result[ys[keep], xs[keep]] = value
+
+    def _near_elements(self, bboxes: np.ndarray, x_off: int, y_off: int, w: int, h: int) -> np.ndarray:
+        """Indices of the elements whose pixel bbox touches the crop region."""
+        # Check bbox overlap with the extended crop region for all elements at once
+        ex, ey, ew, eh = bboxes.T
+        near = (ex <= x_off + w) & (ex + ew >= x_off) & (ey <= y_off + h) & (ey + eh >= y_off)
+        return np.flatnonzero(near)
 
     def _element_pixel_bbox(self, elem: IfcElement) -> tuple[int, int, int, int]:
         bx, by, bw, bh = elem.bbox
@@ -105,11 +148,18 @@ class MaskGenerator:
         ph = int(bh * self.filler.scale)
         return (px, py, pw, ph)
 
-    def _overlay_split_boundary(self, result: np.ndarray, crop_mask: np.ndarray,
+    def _element_pixel_bboxes(self, elements: list[IfcElement]) -> np.ndarray:
+        """Pixel bboxes of all elements as an (N, 4) int array of (x, y, w, h)."""
+        return np.array(
+            [self._element_pixel_bbox(elem) for elem in elements], dtype=np.int64
+        ).reshape(-1, 4)
+
+    def _overlay_split_boundary(self, result: np.ndarray, boundary_zone: np.ndarray,
                                 split_line_px: tuple, x_off: int, y_off: int,
                                 w: int, h: int):
         """Encode the split boundary as a synthetic archway door.
 
+        boundary_zone is the room half's own boundary strip (see _boundary_zone).
         Central ~65% of the split edge is marked as door (170).
         Corner ~17.5% on each end stays void (0) to simulate wall segments.
         """
@@ -117,23 +167,26 @@ class MaskGenerator:
         p1 = (p1_full[0] - x_off, p1_full[1] - y_off)
         p2 = (p2_full[0] - x_off, p2_full[1] - y_off)
 
-        # Build boundary zone for this room half
-        kernel_dilate = np.ones((11, 11), dtype=np.uint8)
-        kernel_erode = np.ones((3, 3), dtype=np.uint8)
-        dilated = cv2.dilate(crop_mask.astype(np.uint8), kernel_dilate, iterations=1)
-        eroded = cv2.erode(crop_mask.astype(np.uint8), kernel_erode, iterations=1)
-        boundary_zone = (dilated > 0) & (eroded == 0)
-
-        # Draw the full split line
-        line_img = np.zeros((h, w), dtype=np.uint8)
-        cv2.line(line_img, p1, p2, 255, thickness=3)
+        # Draw the split line into a buffer covering just its own extent (the
+        # thick stroke reaches at most STROKE_REACH px past the endpoints)
+        # rather than the whole crop
+        lx0 = max(0, min(p1[0], p2[0]) - STROKE_REACH)
+        ly0 = max(0, min(p1[1], p2[1]) - STROKE_REACH)
+        lx1 = min(w, max(p1[0], p2[0]) + STROKE_REACH + 1)
+        ly1 = min(h, max(p1[1], p2[1]) + STROKE_REACH + 1)
+        if lx0 >= lx1 or ly0 >= ly1:
+            return
+        line_img = np.zeros((ly1 - ly0, lx1 - lx0), dtype=np.uint8)
+        cv2.line(line_img, (p1[0] - lx0, p1[1] - ly0), (p2[0] - lx0, p2[1] - ly0), 255, thickness=3)
 
         # Find pixels on the split line AND in the boundary zone
-        split_boundary = (line_img > 0) & boundary_zone
-        ys, xs = np.where(split_boundary)
+        split_boundary = cv2.bitwise_and(line_img, boundary_zone[ly0:ly1, lx0:lx1])
+        ys, xs = np.nonzero(split_boundary)
 
         if len(xs) == 0:
             return
+        ys += ly0
+        xs += lx0
 
         # Compute parametric position along the line for each pixel (0..1)
         dx = p2[0] - p1[0]
@@ -160,16 +213,10 @@ class MaskGenerator:
         img_h, img_w = self.filler.raster_h, self.filler.raster_w
 
         # Find the bounding box covering all rooms
-        all_ys = []
-        all_xs = []
-        for room in rooms:
-            ys, xs = np.where(room.flood_mask)
-            all_ys.append(ys)
-            all_xs.append(xs)
-        all_ys = np.concatenate(all_ys)
-        all_xs = np.concatenate(all_xs)
-        y_min, y_max = int(all_ys.min()), int(all_ys.max())
-        x_min, x_max = int(all_xs.min()), int(all_xs.max())
+        x_min = min(room.flood_mask.bbox[0] for room in rooms)
+        y_min = min(room.flood_mask.bbox[1] for room in rooms)
+        x_max = max(room.flood_mask.bbox[2] for room in rooms) - 1
+        y_max = max(room.flood_mask.bbox[3] for room in rooms) - 1
 
         # Expand by margin
         y_min_ext = max(0, y_min - CROP_MARGIN)
@@ -179,44 +226,53 @@ class MaskGenerator:
 
         h = y_max_ext - y_min_ext + 1
         w = x_max_ext - x_min_ext + 1
-        result = np.zeros((h, w), dtype=np.uint8)
 
-        # Fill all rooms' floor areas
+        # Merge the rooms by OR-ing each one's own bbox crop into place, so no
+        # room is unpacked over the whole union window
+        combined = np.zeros((h, w), dtype=bool)
         for room in rooms:
-            crop_mask = room.flood_mask[y_min_ext:y_max_ext + 1, x_min_ext:x_max_ext + 1]
-            result[crop_mask] = 85
+            bx0, by0, bx1, by1 = room.flood_mask.bbox
+            window = combined[by0 - y_min_ext:by1 - y_min_ext, bx0 - x_min_ext:bx1 - x_min_ext]
+            window |= room.flood_mask.crop(by0, by1, bx0, bx1)
 
-        # Build combined boundary zone for door/window detection
-        combined_mask = np.zeros((h, w), dtype=np.uint8)
-        for room in rooms:
-            crop_mask = room.flood_mask[y_min_ext:y_max_ext + 1, x_min_ext:x_max_ext + 1]
-            combined_mask[crop_mask] = 1
-        kernel_dilate = np.ones((11, 11), dtype=np.uint8)
-        kernel_erode = np.ones((3, 3), dtype=np.uint8)
-        dilated = cv2.dilate(combined_mask, kernel_dilate, iterations=1)
-        eroded = cv2.erode(combined_mask, kernel_erode, iterations=1)
-        boundary_zone = (dilated > 0) & (eroded == 0)
-
-        # Overlay doors and windows
-        self._overlay_elements(result, boundary_zone, self.doors, x_min_ext, y_min_ext, w, h, 170)
-        self._overlay_elements(result, boundary_zone, self.windows, x_min_ext, y_min_ext, w, h, 255)
-
-        # Overlay synthetic doors at split boundaries for split rooms
+        # Fill all rooms' floor areas
+        result = combined.view(np.uint8) * 85
+
+        # Overlay doors and windows. The union crop can span the whole plan, so
+        # the combined boundary zone is only built around each element
+        self._overlay_elements_local(result, combined, self.doors, self._door_bboxes,
+                                     x_min_ext, y_min_ext, w, h, 170)
+        self._overlay_elements_local(result, combined, self.windows, self._window_bboxes,
+                                     x_min_ext, y_min_ext, w, h, 255)
+
+        # Overlay synthetic doors at split boundaries for split rooms; each
+        # uses its own half's boundary zone, not the combined one
         for room in rooms:
             if room.split_line_px is not None:
-                crop_mask = room.flood_mask[y_min_ext:y_max_ext + 1, x_min_ext:x_max_ext + 1]
-                self._overlay_split_boundary(result, crop_mask, room.split_line_px,
-                                             x_min_ext, y_min_ext, w, h)
+                crop_mask = room.flood_mask.crop(y_min_ext, y_max_ext + 1, x_min_ext, x_max_ext + 1)
+                self._overlay_split_boundary(result, self._boundary_zone(crop_mask),
+                                             room.split_line_px, x_min_ext, y_min_ext, w, h)
 
-        result = self._pad_to_square(result)
-        result = cv2.resize(result, (120, 120), interpolation=cv2.INTER_NEAREST)
-        return result
+        return self._pad_and_resize(result)
 
-    def _pad_to_square(self, img: np.ndarray) -> np.ndarray:
+    def _pad_and_resize(self, img: np.ndarray) -> np.ndarray:
+        """Centre img on a square of zeros and nearest-resize that to MASK_SIZE.
+
+        The padded square is never built: each output row/column is mapped to
+        the source pixel cv2.INTER_NEAREST would pick in it, and those that fall
+        in the padding stay 0.
+        """
         h, w = img.shape
         size = max(h, w)
-        padded = np.zeros((size, size), dtype=np.uint8)
         y_off = (size - h) // 2
         x_off = (size - w) // 2
-        padded[y_off:y_off + h, x_off:x_off + w] = img
-        return padded
+        # cv2.INTER_NEAREST takes floor(i * src / dst), with the scale as it computes it
+        idx = np.floor(np.arange(MASK_SIZE) * (1.0 / (MASK_SIZE / size))).astype(np.intp)
+        idx = np.minimum(idx, size - 1)
+        ys = idx - y_off
+        xs = idx - x_off
+        rows = (ys >= 0) & (ys < h)
+        cols = (xs >= 0) & (xs < w)
+        result = np.zeros((MASK_SIZE, MASK_SIZE), dtype=np.uint8)
+        result[np.ix_(rows, cols)] = img[np.ix_(ys[rows], xs[cols])]
+        return result
@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
 import numpy as np
+import cv2
 
 
 @dataclass
@@ -14,11 +15,57 @@ class IfcElement:
     bbox: tuple  # (x, y, w, h) in SVG coords
 
 
+def mask_bbox(mask: np.ndarray) -> tuple[int, int, int, int]:
+    """Return the (x0, y0, x1, y1) bounds of a non-empty boolean mask, end-exclusive."""
+    # boundingRect scans the bytes once without building index arrays
+    x, y, w, h = cv2.boundingRect(mask.view(np.uint8))
+    return (x, y, x + w, y + h)
+
+
+class PackedMask:
+    """Boolean raster mask stored as its bbox crop, one bit per pixel.
+
+    Pixels outside bbox are all False, so only the crop is kept; a room
+    costs bbox_h * bbox_w / 8 bytes instead of a full raster.
+    """
+
+    def __init__(self, mask: np.ndarray, bbox: tuple[int, int, int, int] | None = None):
+        self.shape: tuple[int, int] = mask.shape
+        # (x0, y0, x1, y1) pixel bounds of the set region, end-exclusive
+        self.bbox: tuple[int, int, int, int] = bbox if bbox is not None else mask_bbox(mask)
+        x0, y0, x1, y1 = self.bbox
+        self.bits = np.packbits(mask[y0:y1, x0:x1], axis=1)
+
+    def crop(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """Return the boolean sub-mask [y0:y1, x0:x1], unpacking only that region."""
+        bx0, by0, bx1, by1 = self.bbox
+        if bx0 <= x0 and x1 <= bx1 and by0 <= y0 and y1 <= by1:
+            return self._local(y0 - by0, y1 - by0, x0 - bx0, x1 - bx0)
+
+        # Region reaches past the bbox: place the overlapping part into zeros
+        out = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        ix0, iy0 = max(x0, bx0), max(y0, by0)
+        ix1, iy1 = min(x1, bx1), min(y1, by1)
+        if ix0 < ix1 and iy0 < iy1:
+            out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = self._local(
+                iy0 - by0, iy1 - by0, ix0 - bx0, ix1 - bx0
+            )
+        return out
+
+    def _local(self, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+        """Unpack [y0:y1, x0:x1] in bbox-local coordinates."""
+        b0 = x0 >> 3
+        b1 = (x1 + 7) >> 3
+        sub = np.unpackbits(self.bits[y0:y1, b0:b1], axis=1)
+        off = x0 - (b0 << 3)
+        return sub[:, off:off + (x1 - x0)].view(bool)
+
+
 @dataclass
 class Room:
     id: int
     label: str  # "bedroom", "livingroom/diningroom", "all", "bathroom", "balcony", or "" if unlabeled
-    flood_mask: np.ndarray  # boolean mask at raster resolution
+    flood_mask: PackedMask  # bit-packed bbox crop of the boolean mask at raster resolution
     bbox_svg: tuple  # (x, y, w, h) in SVG coordinate space
     unit_id: int | None = None
     split_from: int | None = None  # id of original room this was split from
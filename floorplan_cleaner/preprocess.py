@@ -2,6 +2,24 @@ import os
 import re
 import tempfile
 
+# (abspath, mtime) of a source SVG -> path of its centered temp copy
+_centered_cache: dict[tuple[str, float], str] = {}
+
+
+# Content coordinates: M/L path commands, or a whole <line>/<rect>/<circle> tag
+_CONTENT_RE = re.compile(r'[ML]([\d.]+),([\d.]+)|<(line|rect|circle)[^>]*>')
+_X1_RE = re.compile(r'x1="([^"]*)"')
+_X2_RE = re.compile(r'x2="([^"]*)"')
+_Y1_RE = re.compile(r'y1="([^"]*)"')
+_Y2_RE = re.compile(r'y2="([^"]*)"')
+_RECT_X_RE = re.compile(r' x="([^"]*)"')
+_RECT_Y_RE = re.compile(r' y="([^"]*)"')
+_WIDTH_RE = re.compile(r'width="([^"]*)"')
+_HEIGHT_RE = re.compile(r'height="([^"]*)"')
+_CX_RE = re.compile(r'cx="([^"]*)"')
+_CY_RE = re.compile(r'cy="([^"]*)"')
+_R_RE = re.compile(r' r="([^"]*)"')
+
 
 def _extract_content_bbox(svg_text: str) -> tuple[float, float, float, float] | None:
     """Extract bounding box of all path coordinates in the SVG body (outside <defs>).
@@ -12,54 +30,55 @@ def _extract_content_bbox(svg_text: str) -> tuple[float, float, float, float] |
     defs_end = svg_text.find("</defs>")
     body = svg_text[defs_end:] if defs_end != -1 else svg_text
 
-    xs = []
-    ys = []
-
-    # Extract coordinates from path d attributes (M/L commands)
-    for m in re.finditer(r'[ML]([\d.]+),([\d.]+)', body):
-        xs.append(float(m.group(1)))
-        ys.append(float(m.group(2)))
-
-    # Extract coordinates from line elements
-    for m in re.finditer(r'<line[^>]*>', body):
-        line = m.group(0)
-        for attr in ('x1', 'x2'):
-            am = re.search(rf'{attr}="([^"]*)"', line)
-            if am:
-                xs.append(float(am.group(1)))
-        for attr in ('y1', 'y2'):
-            am = re.search(rf'{attr}="([^"]*)"', line)
-            if am:
-                ys.append(float(am.group(1)))
-
-    # Extract coordinates from rect elements
-    for m in re.finditer(r'<rect[^>]*>', body):
-        rect = m.group(0)
-        xm = re.search(r' x="([^"]*)"', rect)
-        ym = re.search(r' y="([^"]*)"', rect)
-        wm = re.search(r'width="([^"]*)"', rect)
-        hm = re.search(r'height="([^"]*)"', rect)
-        if xm and ym and wm and hm:
+    # One pass over the body, keeping running bounds instead of coordinate lists
+    inf = float("inf")
+    min_x = min_y = inf
+    max_x = max_y = -inf
+
+    for m in _CONTENT_RE.finditer(body):
+        tag = m.group(3)
+        if tag is None:
+            # Path d attribute coordinate (M/L command)
+            xs = (float(m.group(1)),)
+            ys = (float(m.group(2)),)
+        elif tag == "line":
+            line = m.group(0)
+            xs = tuple(float(am.group(1)) for am in (_X1_RE.search(line), _X2_RE.search(line)) if am)
+            ys = tuple(float(am.group(1)) for am in (_Y1_RE.search(line), _Y2_RE.search(line)) if am)
+        elif tag == "rect":
+            rect = m.group(0)
+            xm, ym = _RECT_X_RE.search(rect), _RECT_Y_RE.search(rect)
+            wm, hm = _WIDTH_RE.search(rect), _HEIGHT_RE.search(rect)
+            if not (xm and ym and wm and hm):
+                continue
             rx, ry = float(xm.group(1)), float(ym.group(1))
             rw, rh = float(wm.group(1)), float(hm.group(1))
-            xs.extend([rx, rx + rw])
-            ys.extend([ry, ry + rh])
-
-    # Extract coordinates from circle elements
-    for m in re.finditer(r'<circle[^>]*>', body):
-        circ = m.group(0)
-        cxm = re.search(r'cx="([^"]*)"', circ)
-        cym = re.search(r'cy="([^"]*)"', circ)
-        rm = re.search(r' r="([^"]*)"', circ)
-        if cxm and cym and rm:
+            xs = (rx, rx + rw)
+            ys = (ry, ry + rh)
+        else:
+            circ = m.group(0)
+            cxm, cym, rm = _CX_RE.search(circ), _CY_RE.search(circ), _R_RE.search(circ)
+            if not (cxm and cym and rm):
+                continue
             cx, cy, r = float(cxm.group(1)), float(cym.group(1)), float(rm.group(1))
-            xs.extend([cx - r, cx + r])
-            ys.extend([cy - r, cy + r])
-
-    if not xs or not ys:
+            xs = (cx - r, cx + r)
+            ys = (cy - r, cy + r)
+
+        for x in xs:
+            if x < min_x:
+                min_x = x
+            if x > max_x:
+                max_x = x
+        for y in ys:
+            if y < min_y:
+                min_y = y
+            if y > max_y:
+                max_y = y
+
+    if min_x == inf or min_y == inf:
         return None
 
-    return (min(xs), min(ys), max(xs), max(ys))
+    return (min_x, min_y, max_x, max_y)
 
 
 def center_svg(svg_path: str) -> str:
@@ -69,8 +88,15 @@ def center_svg(svg_path: str) -> str:
     the actual content bounding box, then rewrites the viewBox and
     width/height so the SVG edges align with the content.
 
-    Returns the path to the preprocessed SVG file (temp file).
+    Returns the path to the preprocessed SVG file (temp file). The result is
+    reused while the source file is unchanged, so downstream caches keyed on
+    the output path stay valid across reopening the same plan.
     """
+    cache_key = (os.path.abspath(svg_path), os.path.getmtime(svg_path))
+    cached = _centered_cache.get(cache_key)
+    if cached is not None and os.path.exists(cached):
+        return cached
+
     with open(svg_path, "r", encoding="utf-8") as f:
         svg_text = f.read()
 
@@ -89,6 +115,7 @@ def center_svg(svg_path: str) -> str:
     bbox = _extract_content_bbox(svg_text)
     if bbox is None:
         print("[preprocess] No content coordinates found, skipping centering.")
+        _centered_cache[cache_key] = svg_path
         return svg_path
 
     min_x, min_y, max_x, max_y = bbox
@@ -129,4 +156,5 @@ def center_svg(svg_path: str) -> str:
         f" -> {new_vb_x:.1f},{new_vb_y:.1f},{new_vb_w:.1f},{new_vb_h:.1f}"
     )
 
+    _centered_cache[cache_key] = output_path
     return output_path
\ No newline at end of file
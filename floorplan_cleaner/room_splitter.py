@@ -1,16 +1,27 @@
 import numpy as np
 import cv2
-from .models import IfcElement
+from .models import IfcElement, mask_bbox
 from .flood_fill import FloodFiller
 
+# Reach used to attach leftover split fragments to a neighbouring half
+_FRAGMENT_KERNEL = np.ones((5, 5), dtype=np.uint8)
 
-def mask_to_contour(mask: np.ndarray) -> np.ndarray:
+# Reach into the walls when assigning doors/windows to split halves
+_WALL_ZONE_KERNEL = np.ones((15, 15), dtype=np.uint8)
+
+
+def mask_to_contour(mask: np.ndarray, compress: bool = False) -> np.ndarray:
     """Extract the outer polygon boundary of a boolean flood_mask.
 
-    Returns an Nx2 array of (x, y) pixel coordinates.
+    Returns an Nx2 array of (x, y) pixel coordinates. With `compress`, straight
+    runs are reduced to their end points (cv2.CHAIN_APPROX_SIMPLE) instead of
+    listing every boundary pixel.
     """
-    mask_u8 = mask.astype(np.uint8) * 255
-    contours, _ = cv2.findContours(mask_u8, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    # findContours treats any nonzero pixel as set, so the bool mask is passed
+    # as a zero-copy uint8 view
+    mask_u8 = mask.view(np.uint8)
+    method = cv2.CHAIN_APPROX_SIMPLE if compress else cv2.CHAIN_APPROX_NONE
+    contours, _ = cv2.findContours(mask_u8, cv2.RETR_EXTERNAL, method)
     if not contours:
         raise ValueError("No contour found for room mask")
     largest = max(contours, key=cv2.contourArea)
@@ -19,11 +30,56 @@ def mask_to_contour(mask: np.ndarray) -> np.ndarray:
 
 def snap_to_contour(point: tuple[int, int], contour: np.ndarray) -> tuple[int, int]:
     """Find the nearest contour vertex to the given pixel coordinate."""
-    dists = np.sum((contour - np.array(point)) ** 2, axis=1)
+    # Row-wise dot product: one pass, no squared temporary or separate reduction
+    delta = contour - np.array(point)
+    dists = np.einsum("ij,ij->i", delta, delta)
     idx = np.argmin(dists)
     return (int(contour[idx, 0]), int(contour[idx, 1]))
 
 
+class ContourSnapper:
+    """Nearest-vertex lookup on a fixed contour, for repeated snapping.
+
+    Vertices are sorted by x once, so a query only scans the vertical slab
+    that can hold the nearest vertex instead of the whole contour. Results
+    match snap_to_contour, including which vertex wins a tie.
+    """
+
+    # Below this many vertices a plain scan is as fast as the slab search
+    LINEAR_SCAN_MAX = 64
+
+    # Vertices around the query x used to seed the slab radius
+    SEED_WINDOW = 32
+
+    def __init__(self, contour: np.ndarray):
+        self.contour = np.ascontiguousarray(contour, dtype=np.int32)
+        self._order = np.argsort(self.contour[:, 0], kind="stable")
+        self._sorted = self.contour[self._order].astype(np.int64)
+        self._xs = np.ascontiguousarray(self._sorted[:, 0])
+
+    def snap(self, point: tuple[int, int]) -> tuple[int, int]:
+        """Find the nearest contour vertex to the given pixel coordinate."""
+        n = len(self._xs)
+        if n <= self.LINEAR_SCAN_MAX:
+            return snap_to_contour(point, self.contour)
+
+        px, py = point
+        # Any vertex near px in x order gives an upper bound on the distance
+        i = int(np.searchsorted(self._xs, px))
+        seed = self._sorted[max(0, i - self.SEED_WINDOW):min(n, i + self.SEED_WINDOW)]
+        delta = seed - (px, py)
+        radius = int(np.ceil(np.sqrt(np.einsum("ij,ij->i", delta, delta).min())))
+
+        # Only vertices with |x - px| <= radius can beat that bound
+        lo = int(np.searchsorted(self._xs, px - radius, side="left"))
+        hi = int(np.searchsorted(self._xs, px + radius, side="right"))
+        delta = self._sorted[lo:hi] - (px, py)
+        dists = np.einsum("ij,ij->i", delta, delta)
+        # Ties go to the lowest contour index, as with a full argmin
+        idx = self._order[lo:hi][dists == dists.min()].min()
+        return (int(self.contour[idx, 0]), int(self.contour[idx, 1]))
+
+
 def split_mask(
     mask: np.ndarray, p1: tuple[int, int], p2: tuple[int, int]
 ) -> tuple[np.ndarray, np.ndarray]:
@@ -39,12 +95,13 @@ def split_mask(
     cut = mask.copy()
     cut[line_img > 0] = False
 
-    num_labels, labels = cv2.connectedComponents(cut.astype(np.uint8))
+    # Areas and bounding boxes of all components come from the labeling pass
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(cut.view(np.uint8))
     # num_labels includes background (0), real components are 1..num_labels-1
 
     component_sizes = []
     for label_id in range(1, num_labels):
-        component_sizes.append((int(np.sum(labels == label_id)), label_id))
+        component_sizes.append((int(stats[label_id, cv2.CC_STAT_AREA]), label_id))
     component_sizes.sort(reverse=True)
 
     if len(component_sizes) < 2:
@@ -56,28 +113,35 @@ def split_mask(
     half_a = labels == main_a_id
     half_b = labels == main_b_id
 
-    # Assign remaining tiny fragments to the nearest main component
-    kernel = np.ones((5, 5), dtype=np.uint8)
+    # Assign remaining tiny fragments to the nearest main component. Dilation
+    # only reaches `reach` px, so each fragment is compared within its own
+    # bbox grown by that much instead of dilating both full halves per fragment.
+    reach = _FRAGMENT_KERNEL.shape[0] // 2
     for i in range(2, len(component_sizes)):
         frag_id = component_sizes[i][1]
-        frag_mask = labels == frag_id
-        dilated_a = cv2.dilate(half_a.astype(np.uint8), kernel) > 0
-        dilated_b = cv2.dilate(half_b.astype(np.uint8), kernel) > 0
-        overlap_a = int(np.sum(frag_mask & dilated_a))
-        overlap_b = int(np.sum(frag_mask & dilated_b))
+        fx, fy, fw, fh = stats[frag_id, :4]
+        y0, y1 = max(0, fy - reach), min(h, fy + fh + reach)
+        x0, x1 = max(0, fx - reach), min(w, fx + fw + reach)
+        frag_mask = labels[y0:y1, x0:x1] == frag_id
+        win_a = half_a[y0:y1, x0:x1]
+        win_b = half_b[y0:y1, x0:x1]
+        dilated_a = cv2.dilate(win_a.view(np.uint8), _FRAGMENT_KERNEL) > 0
+        dilated_b = cv2.dilate(win_b.view(np.uint8), _FRAGMENT_KERNEL) > 0
+        overlap_a = np.count_nonzero(frag_mask & dilated_a)
+        overlap_b = np.count_nonzero(frag_mask & dilated_b)
         if overlap_a >= overlap_b:
-            half_a = half_a | frag_mask
+            win_a |= frag_mask
         else:
-            half_b = half_b | frag_mask
+            win_b |= frag_mask
 
     return half_a, half_b
 
 
 def compute_bbox_svg(mask: np.ndarray, filler: FloodFiller) -> tuple:
     """Recompute the SVG-space bounding box from a boolean mask."""
-    ys, xs = mask.nonzero()
-    svg_x, svg_y = filler.pixel_to_svg(int(xs.min()), int(ys.min()))
-    svg_x2, svg_y2 = filler.pixel_to_svg(int(xs.max()), int(ys.max()))
+    x0, y0, x1, y1 = mask_bbox(mask)
+    svg_x, svg_y = filler.pixel_to_svg(x0, y0)
+    svg_x2, svg_y2 = filler.pixel_to_svg(x1 - 1, y1 - 1)
     return (svg_x, svg_y, svg_x2 - svg_x, svg_y2 - svg_y)
 
 
@@ -93,42 +157,34 @@ def assign_elements_to_halves(
     """
     h, w = half_a.shape
 
-    # Dilated versions for catching wall-zone elements
-    kernel = np.ones((15, 15), dtype=np.uint8)
-    dilated_a = cv2.dilate(half_a.astype(np.uint8), kernel) > 0
-    dilated_b = cv2.dilate(half_b.astype(np.uint8), kernel) > 0
+    # Dilated versions for catching wall-zone elements, only built once an
+    # element actually misses both halves
+    dilated = None
 
     elems_a = []
     elems_b = []
 
     for elem in elements:
-        # Render element paths into a temporary mask
-        elem_mask = np.zeros((h, w), dtype=np.uint8)
-        for path_coords in elem.paths:
-            pts = np.array(
-                [
-                    (
-                        int((x - filler.viewbox[0]) * filler.scale),
-                        int((y - filler.viewbox[1]) * filler.scale),
-                    )
-                    for x, y in path_coords
-                ],
-                dtype=np.int32,
-            )
-            if len(pts) < 2:
-                continue
-            cv2.polylines(elem_mask, [pts], isClosed=False, color=255, thickness=3)
-
-        elem_bool = elem_mask > 0
+        ys, xs = filler.stroke_pixels(elem, 0, 0, w, h)
+        if len(ys) == 0:
+            # Nothing drawn inside the image: no overlap with either half
+            elems_a.append(elem)
+            continue
 
         # Check overlap with each half
-        overlap_a = int(np.sum(elem_bool & half_a))
-        overlap_b = int(np.sum(elem_bool & half_b))
+        overlap_a = np.count_nonzero(half_a[ys, xs])
+        overlap_b = np.count_nonzero(half_b[ys, xs])
 
         # If no direct overlap, try dilated versions
         if overlap_a == 0 and overlap_b == 0:
-            overlap_a = int(np.sum(elem_bool & dilated_a))
-            overlap_b = int(np.sum(elem_bool & dilated_b))
+            if dilated is None:
+                dilated = tuple(
+                    cv2.dilate(half.view(np.uint8), _WALL_ZONE_KERNEL) > 0
+                    for half in (half_a, half_b)
+                )
+            dilated_a, dilated_b = dilated
+            overlap_a = np.count_nonzero(dilated_a[ys, xs])
+            overlap_b = np.count_nonzero(dilated_b[ys, xs])
 
         if overlap_a >= overlap_b:
             elems_a.append(elem)
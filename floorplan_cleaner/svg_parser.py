@@ -58,18 +58,56 @@ def compute_bbox(all_coords: list[tuple[float, float]]) -> tuple[float, float, f
     return (min_x, min_y, max_x - min_x, max_y - min_y)
 
 
+def _local_tag(tag: str) -> str:
+    """Strip the namespace from an element tag, if present."""
+    return tag.split('}', 1)[1] if tag.startswith('{') else tag
+
+
 class SvgParser:
     def __init__(self, svg_path: str):
         self.svg_path = svg_path
         self.elements: list[IfcElement] = []
+        self.elements_by_type: dict[str, list[IfcElement]] = {}  # filled during parse
         self.viewbox: tuple[float, float, float, float] = (0, 0, 0, 0)
         self.width_mm: float = 0
         self.height_mm: float = 0
 
     def parse(self) -> list[IfcElement]:
-        tree = ET.parse(self.svg_path)
-        root = tree.getroot()
+        """Stream the SVG and collect IFC elements.
+
+        The file is read with iterparse and each IFC group is converted and
+        cleared as soon as it has been read, so the full element tree is never
+        held in memory. As before, IFC groups are found by descending through
+        non-IFC <g> elements only.
+        """
+        # Per open element: "scan" (root or non-IFC group whose child groups
+        # are inspected), "ifc" (an IFC group being read) or "skip"
+        states: list[str] = []
+        for event, elem in ET.iterparse(self.svg_path, events=("start", "end")):
+            if event == "start":
+                if not states:
+                    self._parse_root_attributes(elem)
+                    states.append("scan")
+                elif states[-1] == "scan" and _local_tag(elem.tag) == "g":
+                    classes = elem.get("class", "").split()
+                    ifc_type = next((c for c in classes if c in IFC_TYPES_OF_INTEREST), None)
+                    states.append("scan" if ifc_type is None else "ifc")
+                else:
+                    states.append("skip")
+                continue
+
+            state = states.pop()
+            if state == "ifc":
+                classes = elem.get("class", "").split()
+                ifc_type = next(c for c in classes if c in IFC_TYPES_OF_INTEREST)
+                self._parse_ifc_element(elem, ifc_type, classes)
+            # Children of scanned elements are finished with once they end
+            if states and states[-1] == "scan":
+                elem.clear()
 
+        return self.elements
+
+    def _parse_root_attributes(self, root):
         # Parse viewBox
         vb = root.get("viewBox", "0 0 0 0")
         parts = vb.split()
@@ -81,35 +119,6 @@ class SvgParser:
         self.width_mm = float(re.sub(r'[^\d.]', '', w_str))
         self.height_mm = float(re.sub(r'[^\d.]', '', h_str))
 
-        # Find all <g> elements with IFC class attributes
-        self._parse_group(root)
-
-        return self.elements
-
-    def _parse_group(self, parent):
-        for elem in parent:
-            tag = elem.tag
-            # Strip namespace if present
-            if tag.startswith('{'):
-                tag = tag.split('}', 1)[1]
-
-            if tag == 'g':
-                cls_attr = elem.get("class", "")
-                classes = cls_attr.split()
-
-                # Check for IFC type
-                ifc_type = None
-                for c in classes:
-                    if c in IFC_TYPES_OF_INTEREST:
-                        ifc_type = c
-                        break
-
-                if ifc_type is not None:
-                    self._parse_ifc_element(elem, ifc_type, classes)
-                else:
-                    # Recurse into non-IFC groups (section containers etc.)
-                    self._parse_group(elem)
-
     def _parse_ifc_element(self, elem, ifc_type: str, classes: list[str]):
         uuid = elem.get("id", "")
         ifc_name = elem.get(f"{{{IFC_NS}}}name", "")
@@ -141,7 +150,7 @@ class SvgParser:
 
         bbox = compute_bbox(all_coords)
 
-        self.elements.append(IfcElement(
+        element = IfcElement(
             uuid=uuid,
             ifc_type=ifc_type,
             ifc_name=ifc_name,
@@ -150,10 +159,13 @@ class SvgParser:
             layer=layer,
             paths=paths,
             bbox=bbox,
-        ))
+        )
+        self.elements.append(element)
+        self.elements_by_type.setdefault(ifc_type, []).append(element)
 
     def get_elements_by_type(self, ifc_type: str) -> list[IfcElement]:
-        return [e for e in self.elements if e.ifc_type == ifc_type]
+        # A copy, so callers can't alter the index
+        return list(self.elements_by_type.get(ifc_type, ()))
 
     def get_boundary_elements(self) -> list[IfcElement]:
         """Get all elements that form room boundaries (walls, doors, columns) in the cut layer."""
@@ -161,8 +173,11 @@ class SvgParser:
         return [e for e in self.elements
                 if e.ifc_type in boundary_types and e.layer == "cut"]
 
+    def get_walls(self) -> list[IfcElement]:
+        return self.get_elements_by_type("IfcWall") + self.get_elements_by_type("IfcWallStandardCase")
+
     def get_doors(self) -> list[IfcElement]:
-        return [e for e in self.elements if e.ifc_type == "IfcDoor"]
+        return self.get_elements_by_type("IfcDoor")
 
     def get_windows(self) -> list[IfcElement]:
-        return [e for e in self.elements if e.ifc_type == "IfcWindow"]
+        return self.get_elements_by_type("IfcWindow")